@@ -1,6 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from main import register_routes
+from utils.ingestion_jobs import resume_pending_jobs
+from utils.evaluation_jobs import evaluation_scheduler
+from utils.services import run_warmups
+from utils.concurrency import run_blocking
+from utils.pdf_vectorizer import shutdown_parse_pool
+from utils.llm_gateway import bind_gateway_loop
+from utils.metrics import TIMING_HEADER, start_request_timing, format_server_timing
+import time
+import asyncio
 
 app = FastAPI()
 
@@ -11,4 +20,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-register_routes(app)
\ No newline at end of file
+register_routes(app)
+
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    if not TIMING_HEADER:
+        return await call_next(request)
+    timings = start_request_timing()
+    started = time.perf_counter()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = format_server_timing(timings, time.perf_counter() - started)
+    return response
+
+@app.on_event("startup")
+async def bind_llm_gateway():
+    bind_gateway_loop(asyncio.get_running_loop())
+
+@app.on_event("startup")
+async def warm_up_models():
+    asyncio.ensure_future(run_blocking(run_warmups))
+
+@app.on_event("startup")
+async def resume_ingestion():
+    resumed = resume_pending_jobs()
+    if resumed:
+        print(f"Resumed {resumed} pending ingestion job(s)")
+
+@app.on_event("startup")
+async def start_evaluation_scheduler():
+    evaluation_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_parse_pool():
+    shutdown_parse_pool()
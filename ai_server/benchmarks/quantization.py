@@ -0,0 +1,126 @@
+"""
+Reports what the compact storage precisions of the NumPy vector index cost
+and save against float32: recall@k of the same queries (against exact float32
+results), size on disk, the time and resident memory of a fresh process that
+opens the store and answers 20 queries, and search latency.
+
+Vectors are synthetic clustered embeddings by default, or the chunks of an
+existing index (queries are then perturbed copies of stored chunks). Run from
+the ai_server directory:
+
+    python -m benchmarks.quantization --chunks 50000
+    python -m benchmarks.quantization --from-index exgenai_vector_index/langchain
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+import numpy as np
+from benchmarks.vector_index import _search_latency, _resident_mb
+from utils.vector_index import NumpyVectorIndex
+
+DIM = 384
+CONFIGS = {
+    "float32": ("float32", 0),
+    "float16": ("float16", 0),
+    "int8": ("int8", 0),
+    "int8+rs": ("int8", None),
+}
+
+
+def _vectors(args, rng) -> np.ndarray:
+    if args.from_index:
+        index = NumpyVectorIndex(args.from_index)
+        return np.asarray(index.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+    centers = rng.normal(size=(max(args.chunks // 50, 1), DIM))
+    vectors = centers[rng.integers(0, len(centers), args.chunks)] + 0.7 * rng.normal(size=(args.chunks, DIM))
+    return vectors.astype(np.float32)
+
+
+def _build(directory: str, precision: str, rescore: int, vectors: np.ndarray, pdfs: int = 20, batch_size: int = 5000):
+    index = NumpyVectorIndex(directory, precision=precision, rescore=rescore)
+    for start in range(0, len(vectors), batch_size):
+        rows = range(start, min(start + batch_size, len(vectors)))
+        index.upsert(
+            ids=[f"chunk-{row}" for row in rows],
+            embeddings=vectors[start:start + batch_size],
+            metadatas=[{"pdf_id": f"pdf-{row % pdfs}"} for row in rows],
+        )
+    index.persist()
+    return index
+
+
+def _recall(ids, baseline) -> float:
+    return float(np.mean([len(set(found) & set(exact)) / max(len(exact), 1) for found, exact in zip(ids, baseline)]))
+
+
+def _probe(directory: str, rescore: int, queries: int):
+    """
+    Runs in a fresh process: opens the store, answers a few queries and reports the cost.
+    """
+    started = time.perf_counter()
+    index = NumpyVectorIndex(directory, rescore=rescore)
+    rng = np.random.default_rng(1)
+    for _ in range(queries):
+        index.query(query_embeddings=rng.normal(size=(1, index._matrix.shape[1])), n_results=9)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"openAndQueryMs": elapsed * 1000, "rssMb": _resident_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall, memory and latency of compact vector precisions")
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=450)
+    parser.add_argument("--k", type=int, default=9)
+    parser.add_argument("--rescore", type=int, default=4, help="Shortlist factor of the rescoring configuration")
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--from-index", help="Use the chunks of an existing NumPy index instead of synthetic vectors")
+    parser.add_argument("--probe", nargs=3, metavar=("DIR", "RESCORE", "QUERIES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        _probe(args.probe[0], int(args.probe[1]), int(args.probe[2]))
+        return
+
+    rng = np.random.default_rng(0)
+    vectors = _vectors(args, rng)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)] + 0.5 * rng.normal(size=(args.queries, vectors.shape[1]))
+
+    report, baseline = {}, None
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ["float32"] + [name for name in args.configs.split(",") if name != "float32"]:
+            precision, rescore = CONFIGS[name]
+            rescore = args.rescore if rescore is None else rescore
+            directory = os.path.join(tmp, name)
+            _build(directory, precision, rescore, vectors)
+
+            index = NumpyVectorIndex(directory, rescore=rescore)
+            ids = index.query(query_embeddings=queries, n_results=args.k, include=[])["ids"]
+            baseline = baseline or ids
+            probe = subprocess.run(
+                [sys.executable, "-m", "benchmarks.quantization", "--probe", directory, str(rescore), "20"],
+                capture_output=True, text=True, check=True,
+            )
+            report[name] = {
+                "recall": _recall(ids, baseline),
+                "diskMb": index.storage_bytes() / 2**20,
+                "single": _search_latency(index, queries, None, batch=1, k=args.k),
+                "batch9": _search_latency(index, queries, None, batch=9, k=args.k),
+                **json.loads(probe.stdout.strip().splitlines()[-1]),
+            }
+
+    print(f"{len(vectors)} chunks of dim {vectors.shape[1]}, recall@{args.k} against float32, rescoring the top {args.rescore}k")
+    print(f"{'config':<9}{'recall':>8}{'disk MB':>9}{'rss MB':>9}{'cold ms':>9}{'1q p50':>9}{'1q p95':>9}{'9q p50':>9}{'9q p95':>9}")
+    for name, result in report.items():
+        print(
+            f"{name:<9}{result['recall']:>8.3f}{result['diskMb']:>9.1f}{result['rssMb']:>9.1f}{result['openAndQueryMs']:>9.1f}"
+            f"{result['single']['p50Ms']:>9.2f}{result['single']['p95Ms']:>9.2f}"
+            f"{result['batch9']['p50Ms']:>9.2f}{result['batch9']['p95Ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
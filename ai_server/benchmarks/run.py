@@ -0,0 +1,233 @@
+"""
+End-to-end benchmark for the ingest, search, generate and evaluate endpoints.
+
+Run from the ai_server directory:
+
+    python -m benchmarks.run --students 50 --questions 12 --pages 40
+    python -m benchmarks.run --base-url http://localhost:8000 --scenarios search,generate
+    python -m benchmarks.run --scenarios ingest_bulk,search --pdfs 12
+
+By default the app is driven in-process with the fake LLM backend
+(LLM_BACKEND=fake), so the numbers measure this service's own overhead:
+embedding, Chroma, context building, parsing and validation. Stores, caches
+and job directories live in a temporary directory for the run, never the real
+ones. Each run is saved to benchmarks/results/ and compared with the previous one.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import subprocess
+import tempfile
+from typing import Dict, List
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def _measure(client, name: str, requests: List[Dict], concurrency: int) -> Dict:
+    """
+    Sends `requests` ({"method", "url", "json"}) with at most `concurrency` in flight.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async def send(request: Dict):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(request["method"], request["url"], json=request.get("json"))
+                if response.status_code >= 400:
+                    errors.append(f"{response.status_code}: {response.text[:200]}")
+            except Exception as e:
+                errors.append(str(e))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[send(request) for request in requests])
+    wall = time.perf_counter() - started
+
+    return {
+        "scenario": name,
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "firstError": errors[0] if errors else None,
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "p99": _percentile(latencies, 99),
+        "reqPerSec": len(requests) / wall if wall else 0.0,
+        "wallSeconds": wall,
+        "peakRssMb": _peak_rss_mb(),
+    }
+
+
+STATE_DIRS = {
+    "CHROMA_DIR": "vector_store",
+    "VECTOR_INDEX_DIR": "vector_index",
+    "TOPIC_CACHE_DIR": "topic_cache",
+    "INGESTION_JOB_DIR": "ingestion_jobs",
+    "EVALUATION_JOB_DIR": "evaluation_jobs",
+    "LLM_CASSETTE_DIR": "llm_cassettes",
+    "QUESTION_INDEX_DIR": "question_index",
+}
+
+
+async def run(args) -> List[Dict]:
+    if args.base_url:
+        return await _run(args)
+    # In-process runs keep every store, cache and job directory in a throwaway
+    # directory so synthetic chunks never reach the real vector store.
+    with tempfile.TemporaryDirectory(prefix="exgenai-bench-") as state:
+        for name, directory in STATE_DIRS.items():
+            os.environ[name] = os.path.join(state, directory)
+        return await _run(args)
+
+
+async def _run(args) -> List[Dict]:
+    import httpx
+    from benchmarks.synthetic import write_pdf, exam_paper_request, evaluation_request, search_queries
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=None)
+    else:
+        os.environ.setdefault("LLM_BACKEND", "fake")
+        os.environ.setdefault("QUESTION_UNIQUENESS", "false")
+        from app import app
+        from utils.services import run_warmups
+
+        run_warmups()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None)
+
+    scenarios = args.scenarios.split(",")
+    pdf_ids = [f"bench-{args.pages}p-{i}" for i in range(args.pdfs)]
+    results = []
+
+    async with client:
+        if "ingest" in scenarios:
+            with tempfile.TemporaryDirectory() as tmp:
+                requests = []
+                for i, pdf_id in enumerate(pdf_ids):
+                    path = os.path.join(tmp, f"{pdf_id}.pdf")
+                    write_pdf(path, args.pages, seed=i)
+                    requests.append({
+                        "method": "POST",
+                        "url": "/api/v1/vectorize-pdf",
+                        "json": {"pdf_path": path, "metadata": {"pdf_id": pdf_id, "chapter": f"Chapter {i + 1}"}},
+                    })
+                results.append(await _measure(client, "ingest", requests, concurrency=1))
+
+        if "ingest_bulk" in scenarios:
+            with tempfile.TemporaryDirectory() as tmp:
+                pdfs = []
+                for i, pdf_id in enumerate(pdf_ids):
+                    path = os.path.join(tmp, f"{pdf_id}.pdf")
+                    write_pdf(path, args.pages, seed=i)
+                    pdfs.append({"pdf_path": path, "metadata": {"pdf_id": pdf_id, "chapter": f"Chapter {i + 1}"}})
+                request = {"method": "POST", "url": "/api/v1/vectorize-pdf/bulk", "json": {"pdfs": pdfs}}
+                results.append(await _measure(client, "ingest_bulk", [request], concurrency=1))
+
+        if "search" in scenarios:
+            requests = [
+                {"method": "POST", "url": "/api/v1/search-chunks", "json": {"query": query, "top_k": 5, "pdf_ids": pdf_ids}}
+                for query in search_queries(args.students * 4)
+            ]
+            results.append(await _measure(client, "search", requests, args.students))
+
+        if "generate" in scenarios:
+            payload = exam_paper_request(pdf_ids)
+            requests = [{"method": "POST", "url": "/api/v1/generate-paper", "json": payload} for _ in range(args.students)]
+            results.append(await _measure(client, "generate", requests, args.students))
+
+        if "evaluate" in scenarios:
+            requests = [
+                {"method": "POST", "url": "/api/v1/evaluate-exam", "json": evaluation_request(pdf_ids, args.questions, seed=i)}
+                for i in range(args.students)
+            ]
+            results.append(await _measure(client, "evaluate", requests, args.students))
+
+    return results
+
+
+def _latest_result() -> Dict:
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(name for name in os.listdir(RESULTS_DIR) if name.endswith(".json"))
+    if not files:
+        return None
+    with open(os.path.join(RESULTS_DIR, files[-1])) as f:
+        return json.load(f)
+
+
+def _print_report(report: Dict, previous: Dict):
+    before = {result["scenario"]: result for result in (previous or {}).get("results", [])}
+    print(f"commit {report['commit']}  backend {report['llmBackend']}  scale {report['scale']}")
+    print(f"{'scenario':<12}{'reqs':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'rss MB':>9}")
+    for result in report["results"]:
+        print(
+            f"{result['scenario']:<12}{result['requests']:>6}{result['errors']:>5}"
+            f"{result['p50'] * 1000:>10.1f}{result['p95'] * 1000:>10.1f}{result['p99'] * 1000:>10.1f}"
+            f"{result['reqPerSec']:>9.1f}{result['peakRssMb']:>9.0f}"
+        )
+        old = before.get(result["scenario"])
+        if old and old["p95"]:
+            change = (result["p95"] - old["p95"]) / old["p95"] * 100
+            print(f"{'':<12}p95 vs {previous['commit']}: {change:+.1f}%")
+        if result["firstError"]:
+            print(f"{'':<12}first error: {result['firstError']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ExGen AI server")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--scenarios", default="ingest,search,generate,evaluate")
+    parser.add_argument("--students", type=int, default=20, help="Concurrent students for search/generate/evaluate")
+    parser.add_argument("--questions", type=int, default=9, help="Answered questions per evaluation")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic syllabus PDF")
+    parser.add_argument("--pdfs", type=int, default=2, help="Synthetic syllabus PDFs to ingest")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y%m%d-%H%M%S"),
+        "llmBackend": "remote" if args.base_url else os.getenv("LLM_BACKEND"),
+        "scale": {"students": args.students, "questions": args.questions, "pages": args.pages, "pdfs": args.pdfs},
+        "results": results,
+    }
+    _print_report(report, _latest_result())
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{report['timestamp']}-{report['commit']}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import random
+from typing import Dict, List
+
+WORDS = (
+    "array stack queue tree graph heap hash table pointer recursion sorting searching "
+    "complexity algorithm memory process thread scheduling deadlock semaphore paging "
+    "database index transaction normalization query join network protocol packet routing "
+    "class object inheritance polymorphism interface exception compiler parser token"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 16))]
+    return " ".join(words).capitalize() + "."
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int, seed: int = 0, lines_per_page: int = 40):
+    """
+    Writes a plain-text PDF with `pages` pages of random course-like sentences.
+    Built by hand so the benchmark doesn't need a PDF authoring library.
+    """
+    rng = random.Random(seed)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for _ in range(pages):
+        text = " T* ".join(f"({_escape(_sentence(rng))}) Tj" for _ in range(lines_per_page))
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def exam_paper_request(pdf_ids: List[str], chapters: int = 4, seed: int = 0) -> Dict:
+    rng = random.Random(seed)
+    return {
+        "questionPaperSchema": {
+            "mcq": {"count": 10, "mark": 1},
+            "subjective": {"count": 4, "mark": 5, "additionalCheckingTip": ""},
+            "code": {"count": 2, "mark": 10, "additionalCheckingTip": ""},
+            "evaluationInstruction": "Evaluate strictly.",
+            "difficultyInstruction": "Medium difficulty.",
+        },
+        "syllabus": [
+            {
+                "chapter": f"Chapter {i + 1}",
+                "url": "",
+                "publicId": pdf_ids[i % len(pdf_ids)],
+                "marks": 50 // chapters,
+                "importantTopics": " ".join(_sentence(rng) for _ in range(3)),
+            }
+            for i in range(chapters)
+        ],
+        "marks": 50,
+        "duration": 90,
+        "subject": "Computer Science",
+    }
+
+
+def evaluation_request(pdf_ids: List[str], questions: int, seed: int = 0) -> Dict:
+    rng = random.Random(seed)
+
+    def answer(i: int) -> Dict:
+        return {
+            "questionId": f"q{i}",
+            "question": _sentence(rng),
+            "answerText": " ".join(_sentence(rng) for _ in range(rng.randint(0, 6))),
+            "marks": 5,
+        }
+
+    code_count = questions // 3
+    return {
+        "subjective_answers": [answer(i) for i in range(code_count, questions)],
+        "code_answers": [answer(i) for i in range(code_count)],
+        "evaluation_instructions": "Evaluate strictly.",
+        "syllabus_ids": pdf_ids,
+    }
+
+
+def search_queries(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [_sentence(rng) for _ in range(count)]
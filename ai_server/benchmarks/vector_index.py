@@ -0,0 +1,136 @@
+"""
+Compares the NumPy vector index with Chroma on the same synthetic collection:
+search latency (single and batched queries, scoped to a few PDFs), cold-open
+time and resident memory of a fresh process that opens the store and runs
+one query (including the backend's own imports).
+
+Run from the ai_server directory:
+
+    python -m benchmarks.vector_index --chunks 5000 --pdfs 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+import numpy as np
+from benchmarks.run import _percentile
+
+DIM = 384
+COLLECTION = "langchain"
+
+
+def _open(backend: str, directory: str):
+    if backend == "numpy":
+        from utils.vector_index import NumpyVectorIndex
+        return NumpyVectorIndex(os.path.join(directory, COLLECTION))
+    import chromadb
+    return chromadb.PersistentClient(path=directory).get_or_create_collection(COLLECTION)
+
+
+def _build(backend: str, directory: str, vectors: np.ndarray, pdfs: int, batch_size: int = 500):
+    collection = _open(backend, directory)
+    for start in range(0, len(vectors), batch_size):
+        rows = range(start, min(start + batch_size, len(vectors)))
+        collection.upsert(
+            ids=[f"chunk-{row}" for row in rows],
+            embeddings=vectors[start:start + batch_size].tolist(),
+            documents=[f"Synthetic chunk {row}" for row in rows],
+            metadatas=[{"pdf_id": f"pdf-{row % pdfs}"} for row in rows],
+        )
+    if backend == "numpy":
+        collection.persist()
+
+
+def _search_latency(collection, queries: np.ndarray, where, batch: int, k: int = 9) -> dict:
+    latencies = []
+    for start in range(0, len(queries), batch):
+        started = time.perf_counter()
+        collection.query(
+            query_embeddings=queries[start:start + batch].tolist(),
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas"],
+        )
+        latencies.append(time.perf_counter() - started)
+    return {"p50Ms": _percentile(latencies, 50) * 1000, "p95Ms": _percentile(latencies, 95) * 1000}
+
+
+def _resident_mb() -> float:
+    """
+    Current resident memory of this process. The peak from getrusage is only a
+    fallback: on Linux it carries over the parent's peak through fork and exec.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _probe(backend: str, directory: str):
+    """
+    Runs in a fresh process: opens the store, answers one query and reports the cost.
+    """
+    started = time.perf_counter()
+    collection = _open(backend, directory)
+    collection.query(query_embeddings=[[1.0] * DIM], n_results=9, where={"pdf_id": "pdf-0"})
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"coldOpenMs": elapsed * 1000, "rssMb": _resident_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy vector index against Chroma")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=450)
+    parser.add_argument("--backends", default="chroma,numpy")
+    parser.add_argument("--probe", nargs=2, metavar=("BACKEND", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        _probe(*args.probe)
+        return
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.chunks, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = rng.normal(size=(args.queries, DIM)).astype(np.float32)
+    scope = {"pdf_id": {"$in": [f"pdf-{i}" for i in range(min(4, args.pdfs))]}}
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends.split(","):
+            directory = os.path.join(tmp, backend)
+            started = time.perf_counter()
+            _build(backend, directory, vectors, args.pdfs)
+            build_seconds = time.perf_counter() - started
+
+            collection = _open(backend, directory)
+            probe = subprocess.run(
+                [sys.executable, "-m", "benchmarks.vector_index", "--probe", backend, directory],
+                capture_output=True, text=True, check=True,
+            )
+            report[backend] = {
+                "buildSeconds": build_seconds,
+                "single": _search_latency(collection, queries, scope, batch=1),
+                "batch9": _search_latency(collection, queries, scope, batch=9),
+                **json.loads(probe.stdout.strip().splitlines()[-1]),
+            }
+
+    print(f"{args.chunks} chunks, {args.pdfs} PDFs, queries scoped to 4 PDFs")
+    print(f"{'backend':<8}{'build s':>9}{'1q p50':>9}{'1q p95':>9}{'9q p50':>9}{'9q p95':>9}{'open ms':>9}{'rss MB':>9}")
+    for backend, result in report.items():
+        print(
+            f"{backend:<8}{result['buildSeconds']:>9.2f}"
+            f"{result['single']['p50Ms']:>9.2f}{result['single']['p95Ms']:>9.2f}"
+            f"{result['batch9']['p50Ms']:>9.2f}{result['batch9']['p95Ms']:>9.2f}"
+            f"{result['coldOpenMs']:>9.1f}{result['rssMb']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
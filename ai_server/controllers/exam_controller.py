@@ -1,23 +1,126 @@
+import math
+from typing import Optional
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
 from schemas.exam_request_schema import ExamPaperRequest
-from schemas.exam_evaluation import ExamEvaluationRequest
-from llms.paper_generator import generate_exam_paper
+import json
+from fastapi.responses import StreamingResponse
+from schemas.exam_evaluation import ExamEvaluationRequest, BatchEvaluationRequest
+from llms.paper_generator import generate_exam_paper, stream_exam_paper
 from llms.exam_evaluator import evaluate_exam_paper
+from utils.paper_bank import paper_bank
+from utils.evaluation_jobs import evaluation_scheduler, submit_batch_evaluation
+from utils.grading_cache import grading_stats
+from utils.context_cache import retrieval_context_cache
+from utils.context_builder import context_builder_stats
+from utils.llm_gateway import ProviderRateLimitError, run_idempotent, gateway_stats
+from utils.question_index import question_index_stats
+
+def _rate_limited(e: ProviderRateLimitError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+async def generate_paper(req: ExamPaperRequest, idempotency_key: Optional[str] = None):
+    async def generate():
+        paper = paper_bank.take(req)
+        if paper is None:
+            paper = await generate_exam_paper(req)
+        return paper
 
-async def generate_paper(req: ExamPaperRequest):
     try:
-        paper = await generate_exam_paper(req)
+        paper = await run_idempotent("generate-paper", idempotency_key, jsonable_encoder(req), generate)
         return {"message": "Exam paper generated successfully", "examPaper": paper}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ProviderRateLimitError as e:
+        raise _rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def evaluate_exam(req: ExamEvaluationRequest):
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_paper(req: ExamPaperRequest):
+    """
+    Server-sent events variant of generate_paper: one "question" event per
+    validated question as soon as it is generated, then a "done" event with the
+    section counts, the validation verdict and the whole paper, or an "error" event.
+    """
+    async def events():
+        paper = paper_bank.take(req)
+        if paper is not None:
+            for section, questions in paper.items():
+                for index, question in enumerate(questions):
+                    yield _sse("question", {"section": section, "index": index, "question": question})
+            sections = {section: len(questions) for section, questions in paper.items()}
+            yield _sse("done", {"sections": sections, "valid": True, "error": None, "examPaper": paper})
+            return
+
+        try:
+            async for event, data in stream_exam_paper(req):
+                yield _sse(event, data)
+        except ValueError as e:
+            yield _sse("error", {"status": 400, "detail": str(e)})
+        except ProviderRateLimitError as e:
+            yield _sse("error", {"status": 503, "detail": str(e), "retryAfter": max(1, math.ceil(e.retry_after))})
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            yield _sse("error", {"status": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def evaluate_exam(req: ExamEvaluationRequest, idempotency_key: Optional[str] = None):
     try:
-        result = await evaluate_exam_paper(req)
+        result = await run_idempotent(
+            "evaluate-exam", idempotency_key, jsonable_encoder(req), lambda: evaluate_exam_paper(req)
+        )
         return {"message": "Exam evaluated successfully", "evaluationResult": result}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ProviderRateLimitError as e:
+        raise _rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def evaluate_exam_batch(req: BatchEvaluationRequest):
+    if not req.submissions:
+        raise HTTPException(status_code=400, detail="At least one submission is required")
+    try:
+        job = submit_batch_evaluation(req.submissions, req.priority)
+        return {"message": "Batch evaluation queued", "job": job.summary()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def get_batch_evaluation(job_id: str, include_results: bool):
+    job = evaluation_scheduler.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch evaluation job not found")
+    return {"job": job.summary(include_results=include_results)}
+
+async def stream_batch_evaluation(job_id: str):
+    job = evaluation_scheduler.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch evaluation job not found")
+
+    async def lines():
+        async for result in evaluation_scheduler.stream(job):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def get_cache_stats():
+    return {
+        "gradingCache": grading_stats(),
+        "retrievalContextCache": retrieval_context_cache.stats(),
+        "contextBuilder": context_builder_stats(),
+        "llmGateway": gateway_stats(),
+        "questionIndex": question_index_stats(),
+    }
@@ -0,0 +1,9 @@
+from fastapi.responses import JSONResponse
+from utils.services import is_ready, readiness
+
+async def handle_liveness():
+    return {"status": "alive"}
+
+async def handle_readiness():
+    status_code = 200 if is_ready() else 503
+    return JSONResponse(status_code=status_code, content=readiness())
@@ -0,0 +1,5 @@
+from fastapi.responses import Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+async def handle_metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
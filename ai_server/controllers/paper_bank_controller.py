@@ -0,0 +1,21 @@
+from fastapi import HTTPException
+from schemas.exam_request_schema import PaperBankRegisterRequest
+from utils.paper_bank import paper_bank
+
+async def handle_register_exam(req: PaperBankRegisterRequest):
+    exam_key = paper_bank.register(req.exam, req.size)
+    return {"message": "Exam registered for pre-generation", "examKey": exam_key, "pool": paper_bank.stats(exam_key)}
+
+async def handle_get_pool_stats(exam_key: str):
+    stats = paper_bank.stats(exam_key)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Exam is not registered in the paper bank")
+    return {"examKey": exam_key, "pool": stats}
+
+async def handle_get_all_pool_stats():
+    return {"pools": paper_bank.stats()}
+
+async def handle_unregister_exam(exam_key: str):
+    if not paper_bank.unregister(exam_key):
+        raise HTTPException(status_code=404, detail="Exam is not registered in the paper bank")
+    return {"message": "Exam removed from the paper bank"}
@@ -1,47 +1,98 @@
+import json
 from fastapi import HTTPException
-from schemas.requests_schema import PDFUploadRequest, ChunkIDRequest, QueryRequest
+from fastapi.responses import StreamingResponse
+from schemas.requests_schema import PDFUploadRequest, BulkPDFUploadRequest, ChunkIDRequest, QueryRequest, BatchQueryRequest
 from utils.pdf_vectorizer import (
     add_pdf_to_vectorstore,
+    ingest_pdfs,
     get_chunk_by_id,
     delete_chunks_by_ids,
     delete_all_chunks,
-    get_all_chunks,
-    search_similar_chunks
+    get_chunks_page,
+    iter_chunks,
+    search_similar_chunks,
+    search_similar_chunks_batch,
 )
+from utils.concurrency import run_blocking, run_ingestion
+from utils.ingestion_jobs import create_ingestion_job, get_job, list_jobs, retry_ingestion_job
 
 async def handle_vectorize_pdf(req: PDFUploadRequest):
     try:
-        topics = add_pdf_to_vectorstore(req.pdf_path, req.metadata)
+        topics = await run_ingestion(add_pdf_to_vectorstore, req.pdf_path, req.metadata)
         return {"message": "Vectorization successful", "importantTopics": topics}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def handle_vectorize_pdfs(req: BulkPDFUploadRequest):
+    try:
+        result = await run_ingestion(ingest_pdfs, [(pdf.pdf_path, pdf.metadata) for pdf in req.pdfs])
+        return {"message": "Vectorization finished", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def handle_create_ingestion_job(req: PDFUploadRequest):
+    try:
+        job = await run_blocking(create_ingestion_job, req.pdf_path, req.metadata)
+        return {"message": "Vectorization job queued", "job": job}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def handle_get_ingestion_job(job_id: str):
+    job = await run_blocking(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job": job}
+
+async def handle_list_ingestion_jobs():
+    return {"jobs": await run_blocking(list_jobs)}
+
+async def handle_retry_ingestion_job(job_id: str):
+    job = await run_blocking(retry_ingestion_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job": job}
+
 async def handle_get_chunk(chunk_id: str):
-    chunk = get_chunk_by_id(chunk_id)
+    chunk = await run_blocking(get_chunk_by_id, chunk_id)
     if not chunk:
         raise HTTPException(status_code=404, detail="Chunk not found")
     return chunk
 
 async def handle_delete_chunks(req: ChunkIDRequest):
     try:
-        delete_chunks_by_ids(req.chunk_ids)
+        await run_blocking(delete_chunks_by_ids, req.chunk_ids)
         return {"message": "Chunks deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def handle_delete_all_chunks():
     try:
-        success = delete_all_chunks()
+        success = await run_blocking(delete_all_chunks)
         return {"message": "All chunks deleted" if success else "No chunks to delete"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def handle_get_all_chunks():
-    return {"chunks": get_all_chunks()}
+async def handle_get_all_chunks(limit: int, offset: int, filters: dict, fields: str, stream: bool):
+    include_text = fields != "metadata"
+    if stream:
+        lines = (json.dumps(chunk) + "\n" for chunk in iter_chunks(filters=filters, include_text=include_text))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    try:
+        return await run_blocking(get_chunks_page, limit=limit, offset=offset, filters=filters, include_text=include_text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 async def handle_search_chunks(req: QueryRequest):
     try:
-        results = search_similar_chunks(req.query, k=req.top_k)
+        results = await run_blocking(search_similar_chunks, req.query, k=req.top_k, pdf_ids=req.pdf_ids)
         return {"results": [chunk.page_content for chunk in results]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+async def handle_search_chunks_batch(req: BatchQueryRequest):
+    try:
+        results = await run_blocking(search_similar_chunks_batch, req.queries, k=req.top_k, pdf_ids=req.pdf_ids)
+        return {"results": [[chunk.page_content for chunk in chunks] for chunks in results]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
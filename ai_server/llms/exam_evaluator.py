@@ -1,19 +1,61 @@
+import os
+import asyncio
+from typing import Dict, List
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from schemas.exam_evaluation import ExamEvaluationRequest
-from utils.pdf_vectorizer import search_similar_chunks
+from utils.pdf_vectorizer import search_similar_chunks_with_embeddings
+from utils.context_builder import build_context
 from prompts.exam_evaluation import evaluation_prompt
 from prompts.exam_evaluation import parser
+from prompts.exam_evaluation import question_evaluation_prompt, question_parser
+from prompts.exam_evaluation import summary_prompt, summary_parser
+from utils.concurrency import run_blocking
+from utils.llm_gateway import ainvoke_limited, ProviderRateLimitError
+from utils.services import register_service, get_service, register_warmup
+from utils.metrics import span, instrument, instrument_llm, record_retry, record_context_stats
+from llms.providers import create_chat_model
+from llms.fake_responses import fake_paper_evaluation, fake_question_evaluation, fake_summary
+from utils.grading_cache import grading_cache, grading_key, is_blank_answer, blank_result
 load_dotenv()
 
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0.3,
-)
+EVALUATION_MODE = os.getenv("EVALUATION_MODE", "per_question")
+EVALUATION_GROUP_SIZE = int(os.getenv("EVALUATION_GROUP_SIZE", "1"))
+EVALUATION_CONCURRENCY = int(os.getenv("EVALUATION_CONCURRENCY", "8"))
+EVALUATION_MAX_RETRIES = int(os.getenv("EVALUATION_MAX_RETRIES", "2"))
+EVALUATION_CONTEXT_K = int(os.getenv("EVALUATION_CONTEXT_K", "2"))
+EVALUATION_CONTEXT_TOKEN_BUDGET = int(os.getenv("EVALUATION_CONTEXT_TOKEN_BUDGET", "4000"))
+QUESTION_CONTEXT_TOKEN_BUDGET = int(os.getenv("QUESTION_CONTEXT_TOKEN_BUDGET", "600"))
 
-chain = evaluation_prompt | llm | parser
+def _create_chains():
+    def llm(fake_responder):
+        model = create_chat_model("groq", fake_responder, model="llama-3.1-8b-instant", temperature=0.3)
+        return instrument_llm(model, "evaluator")
 
-async def evaluate_exam_paper(req:ExamEvaluationRequest):
+    def chain(prompt, fake_responder, output_parser):
+        return (
+            instrument(prompt, "evaluator", "prompt_build")
+            | llm(fake_responder)
+            | instrument(output_parser, "evaluator", "parse")
+        )
+
+    return {
+        "paper": chain(evaluation_prompt, fake_paper_evaluation, parser),
+        "question": chain(question_evaluation_prompt, fake_question_evaluation, question_parser),
+        "summary": chain(summary_prompt, fake_summary, summary_parser),
+    }
+
+register_service("evaluator_chains", _create_chains)
+register_warmup("evaluator_chains", lambda: get_service("evaluator_chains"))
+
+async def evaluate_exam_paper(req: ExamEvaluationRequest):
+    if EVALUATION_MODE == "single":
+        return await evaluate_exam_paper_single(req)
+    return await evaluate_exam_paper_per_question(req)
+
+async def evaluate_exam_paper_single(req:ExamEvaluationRequest):
+    """
+    Grades the whole submission in one LLM call.
+    """
     instructions = req.evaluation_instructions
     subjective = req.subjective_answers
     code = req.code_answers
@@ -32,14 +74,28 @@ async def evaluate_exam_paper(req:ExamEvaluationRequest):
         for question in subjective:
             subjective_questions.append(question.question)
             
-    code_chunks = ""
-    subjective_chunks = ""
-    
-    for question in code_questions:
-        code_chunks += search_similar_chunks(question, k=4)[0].page_content + "\n"
-        
-    for question in subjective_questions:
-        subjective_chunks += search_similar_chunks(question, k=4)[0].page_content + "\n"      
+    query_embeddings, results = await run_blocking(
+        search_similar_chunks_with_embeddings,
+        code_questions + subjective_questions,
+        k=EVALUATION_CONTEXT_K,
+        pdf_ids=req.syllabus_ids,
+    )
+    split = len(code_questions)
+    code_marks = [question.marks for question in code or []]
+    subjective_marks = [question.marks for question in subjective or []]
+    total_marks = sum(code_marks) + sum(subjective_marks) or 1
+
+    with span("evaluator", "context_build"):
+        code_chunks, code_stats = build_context(
+            query_embeddings[:split], results[:split], code_marks,
+            EVALUATION_CONTEXT_TOKEN_BUDGET * sum(code_marks) / total_marks,
+        )
+        subjective_chunks, subjective_stats = build_context(
+            query_embeddings[split:], results[split:], subjective_marks,
+            EVALUATION_CONTEXT_TOKEN_BUDGET * sum(subjective_marks) / total_marks,
+        )
+    record_context_stats("evaluator", code_stats)
+    record_context_stats("evaluator", subjective_stats)
     
     for code in code:
         code_que_and_ans.append({
@@ -57,7 +113,7 @@ async def evaluate_exam_paper(req:ExamEvaluationRequest):
             "marks": subjective.marks
         })
     
-    output = chain.invoke({
+    output = await ainvoke_limited("groq", get_service("evaluator_chains")["paper"], {
         "code_chunks": code_chunks,
         "subjective_chunks": subjective_chunks,
         "instructions": instructions,
@@ -66,3 +122,142 @@ async def evaluate_exam_paper(req:ExamEvaluationRequest):
     })
     
     return output
+
+def _format_question(item: Dict) -> str:
+    question = item["question"]
+    notes = "\n".join(item["context"]) or "No notes found."
+    return (
+        f"questionId: {question.questionId}\n"
+        f"type: {item['type']}\n"
+        f"max marks: {question.marks}\n"
+        f"question: {question.question}\n"
+        f"student answer: {question.answerText}\n"
+        f"notes:\n{notes}"
+    )
+
+def _parse_group_result(output: Dict, group: List[Dict]) -> Dict[str, Dict]:
+    """
+    Checks that the model graded every question in the group and clamps marks to the allowed range.
+    """
+    graded = {str(result.get("questionId")): result for result in output.get("results", [])}
+    parsed = {}
+    for item in group:
+        question = item["question"]
+        result = graded.get(question.questionId)
+        if result is None:
+            raise ValueError(f"Question {question.questionId} was not graded")
+        marks = float(result.get("marksAwarded", 0))
+        parsed[question.questionId] = {
+            "questionId": question.questionId,
+            "marksAwarded": min(max(marks, 0), question.marks),
+            "answerText": question.answerText,
+            "aiFeedback": result.get("aiFeedback", ""),
+        }
+    return parsed
+
+async def _grade_group(group: List[Dict], instructions: str, semaphore: asyncio.Semaphore) -> Dict[str, Dict]:
+    """
+    Grades a small group of questions, retrying only this group on a failed call or malformed output.
+    """
+    inputs = {
+        "instructions": instructions,
+        "questions": "\n\n---\n\n".join(_format_question(item) for item in group),
+    }
+    async with semaphore:
+        for attempt in range(EVALUATION_MAX_RETRIES + 1):
+            if attempt:
+                record_retry("evaluator", "question")
+            try:
+                output = await ainvoke_limited("groq", get_service("evaluator_chains")["question"], inputs)
+                with span("evaluator", "validate"):
+                    return _parse_group_result(output, group)
+            except ProviderRateLimitError:
+                raise
+            except Exception:
+                if attempt == EVALUATION_MAX_RETRIES:
+                    raise
+
+async def _summarize(graded: List[Dict], max_marks: int) -> Dict:
+    marks_awarded = sum(result["marksAwarded"] for result in graded)
+    graded_questions = "\n".join(
+        f"- {result['questionId']}: {result['marksAwarded']} marks. {result['aiFeedback']}" for result in graded
+    )
+    for attempt in range(EVALUATION_MAX_RETRIES + 1):
+        if attempt:
+            record_retry("evaluator", "summary")
+        try:
+            return await ainvoke_limited("groq", get_service("evaluator_chains")["summary"], {
+                "graded_questions": graded_questions,
+                "marks_awarded": marks_awarded,
+                "max_marks": max_marks,
+            })
+        except ProviderRateLimitError:
+            raise
+        except Exception:
+            if attempt == EVALUATION_MAX_RETRIES:
+                raise
+
+async def evaluate_exam_paper_per_question(req: ExamEvaluationRequest):
+    """
+    Grades each question (or group of EVALUATION_GROUP_SIZE questions) in its own
+    LLM call with only its own retrieved notes. Groups run concurrently, at most
+    EVALUATION_CONCURRENCY per submission, and a failed group is retried on its own.
+    A final light call writes the overall feedback from the per-question results.
+
+    Blank answers are scored 0 without a model call, and answers already graded
+    for the same question, marks and instructions come from the grading cache.
+    """
+    items = (
+        [{"type": "code", "question": question} for question in req.code_answers or []]
+        + [{"type": "subjective", "question": question} for question in req.subjective_answers or []]
+    )
+    if not items:
+        return {"subjective": [], "code": [], "other": {"feedbackSummary": "", "category": "weak"}}
+
+    graded = {}
+    to_grade = []
+    for item in items:
+        question = item["question"]
+        if is_blank_answer(question.answerText):
+            graded[question.questionId] = blank_result(question)
+            continue
+        item["cacheKey"] = grading_key(item["type"], question, req.evaluation_instructions)
+        cached = grading_cache.get(item["cacheKey"])
+        if cached is not None:
+            graded[question.questionId] = {**cached, "questionId": question.questionId, "answerText": question.answerText}
+        else:
+            to_grade.append(item)
+
+    if to_grade:
+        query_embeddings, contexts = await run_blocking(
+            search_similar_chunks_with_embeddings,
+            [item["question"].question for item in to_grade],
+            k=EVALUATION_CONTEXT_K,
+            pdf_ids=req.syllabus_ids,
+        )
+        with span("evaluator", "context_build"):
+            for item, query_embedding, context in zip(to_grade, query_embeddings, contexts):
+                notes, stats = build_context([query_embedding], [context], [1], QUESTION_CONTEXT_TOKEN_BUDGET)
+                record_context_stats("evaluator", stats)
+                item["context"] = [notes] if notes else []
+
+        semaphore = asyncio.Semaphore(EVALUATION_CONCURRENCY)
+        groups = [to_grade[i:i + EVALUATION_GROUP_SIZE] for i in range(0, len(to_grade), EVALUATION_GROUP_SIZE)]
+        for group_result in await asyncio.gather(*[
+            _grade_group(group, req.evaluation_instructions, semaphore) for group in groups
+        ]):
+            graded.update(group_result)
+
+        for item in to_grade:
+            result = graded[item["question"].questionId]
+            grading_cache.set(item["cacheKey"], {
+                "marksAwarded": result["marksAwarded"],
+                "aiFeedback": result["aiFeedback"],
+            })
+
+    code = [graded[item["question"].questionId] for item in items if item["type"] == "code"]
+    subjective = [graded[item["question"].questionId] for item in items if item["type"] == "subjective"]
+    max_marks = sum(item["question"].marks for item in items)
+    other = await _summarize(code + subjective, max_marks)
+
+    return {"subjective": subjective, "code": code, "other": other}
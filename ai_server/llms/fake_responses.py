@@ -0,0 +1,89 @@
+"""
+Responders for the fake LLM backend (LLM_BACKEND=fake).
+
+Each one reads the counts, marks and ids it needs back out of our own prompt
+templates and answers with JSON that passes the chain's output parser and the
+exam validator, so the whole request path can run without network access.
+"""
+import re
+import json
+import random
+
+
+def _json_block(data) -> str:
+    return f"```json\n{json.dumps(data)}\n```"
+
+
+def _mcq(i: int, marks: int) -> dict:
+    return {
+        "text": f"Sample multiple choice question {i} ({random.randint(0, 10**6)})?",
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "correctOption": random.choice(["A", "B", "C", "D"]),
+        "marks": marks,
+    }
+
+
+def _written(kind: str, i: int, marks: int) -> dict:
+    return {"text": f"Sample {kind} question {i} ({random.randint(0, 10**6)}).", "marks": marks}
+
+
+def _section_questions(section: str, count: int, marks: int) -> list:
+    if section.startswith("Multiple Choice"):
+        return [_mcq(i, marks) for i in range(1, count + 1)]
+    kind = "coding" if section.startswith("Coding") else "subjective"
+    return [_written(kind, i, marks) for i in range(1, count + 1)]
+
+
+def _count_and_marks(prompt: str, label: str):
+    match = re.search(rf"{re.escape(label)}: (\d+) questions, each worth (\d+) marks", prompt)
+    return (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+
+
+def fake_exam_paper(prompt: str) -> str:
+    mcq = _count_and_marks(prompt, "Multiple Choice Questions (MCQs)")
+    subjective = _count_and_marks(prompt, "Subjective Questions")
+    code = _count_and_marks(prompt, "Coding Questions")
+    return _json_block({
+        "mcq_questions": _section_questions("Multiple Choice", *mcq),
+        "subjective_questions": _section_questions("Subjective", *subjective),
+        "coding_questions": _section_questions("Coding", *code),
+    })
+
+
+def fake_exam_section(prompt: str) -> str:
+    match = re.search(r"Section: (.+)\nGenerate exactly (\d+) questions, each worth (\d+) marks", prompt)
+    section, count, marks = match.group(1), int(match.group(2)), int(match.group(3))
+    return _json_block({"questions": _section_questions(section, count, marks)})
+
+
+def _graded(question_id: str, max_marks: int) -> dict:
+    return {
+        "questionId": question_id,
+        "marksAwarded": random.randint(0, max_marks),
+        "aiFeedback": "Sample feedback for this answer.",
+    }
+
+
+def fake_paper_evaluation(prompt: str) -> str:
+    code_part, _, subjective_part = prompt.partition("Here are the subjective questions and answers")
+    pattern = re.compile(r"'questionId': '([^']*)'.*?'marks': (\d+)", re.DOTALL)
+    code = [{**_graded(qid, int(marks)), "answerText": ""} for qid, marks in pattern.findall(code_part)]
+    subjective = [{**_graded(qid, int(marks)), "answerText": ""} for qid, marks in pattern.findall(subjective_part)]
+    return _json_block({
+        "subjective": subjective,
+        "code": code,
+        "other": {"feedbackSummary": "Sample overall feedback.", "category": "average"},
+    })
+
+
+def fake_question_evaluation(prompt: str) -> str:
+    pattern = re.compile(r"questionId: (.*)\ntype: .*\nmax marks: (\d+)")
+    return _json_block({"results": [_graded(qid, int(marks)) for qid, marks in pattern.findall(prompt)]})
+
+
+def fake_summary(prompt: str) -> str:
+    return _json_block({"feedbackSummary": "Sample overall feedback.", "category": "average"})
+
+
+def fake_topics(prompt: str) -> str:
+    return "\n".join(f"Topic {i}: Sample description and example questions." for i in range(1, 7))
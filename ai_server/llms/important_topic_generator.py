@@ -1,18 +1,41 @@
-from langchain_huggingface import ChatHuggingFace,HuggingFaceEndpoint
+import os
+import hashlib
+from typing import Dict, List, Optional
+from concurrent.futures import Future
 from dotenv import load_dotenv
-from prompts.important_topic_finder import important_topic_finder_prompt
-from langchain_core.output_parsers import StrOutputParser 
+from prompts.important_topic_finder import important_topic_finder_prompt, important_topic_merge_prompt
+from langchain_core.output_parsers import StrOutputParser
+from utils.llm_gateway import submit_limited, invoke_limited
+from utils.services import register_service, get_service, register_warmup
+from utils.metrics import instrument_llm, register_cache
+from llms.providers import create_chat_model
+from llms.fake_responses import fake_topics
 
 load_dotenv()
 
-llm = HuggingFaceEndpoint(
-    repo_id="mistralai/Mistral-7B-Instruct-v0.3",
-    task="text-generation",
-)
+TOPIC_CACHE_DIR = os.getenv("TOPIC_CACHE_DIR", "exgenai_topic_cache")
+TOPIC_GROUP_MIN_CHARS = int(os.getenv("TOPIC_GROUP_MIN_CHARS", "6000"))
+TOPIC_GROUP_MAX_CHARS = int(os.getenv("TOPIC_GROUP_MAX_CHARS", "16000"))
+TOPIC_GROUP_DIVISOR = int(os.getenv("TOPIC_GROUP_DIVISOR", "4"))
+TOPIC_REDUCE_FANIN = int(os.getenv("TOPIC_REDUCE_FANIN", "8"))
 
-model = ChatHuggingFace(llm=llm)
+def _create_chains():
+    model = instrument_llm(create_chat_model(
+        "huggingface",
+        fake_topics,
+        repo_id="mistralai/Mistral-7B-Instruct-v0.3",
+        task="text-generation",
+    ), "topics")
+    return {
+        "topics": important_topic_finder_prompt | model  | StrOutputParser(),
+        "merge": important_topic_merge_prompt | model | StrOutputParser(),
+    }
 
-chain = important_topic_finder_prompt | model  | StrOutputParser()
+register_service("topic_chains", _create_chains)
+register_warmup("topic_chains", lambda: get_service("topic_chains"))
+
+_cache_counts = {"hits": 0, "misses": 0}
+register_cache("topics", lambda: dict(_cache_counts))
 
 def find_important_topics(doc: str) -> str:
     """
@@ -23,6 +46,113 @@ def find_important_topics(doc: str) -> str:
 
     Returns:
         str: A string containing the most important topics with brief descriptions.
-        
+
+    """
+    return invoke_limited("huggingface", get_service("topic_chains")["topics"], doc)
+
+def _text_hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _store(path: str, future: Future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    os.makedirs(TOPIC_CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(future.result())
+    os.replace(tmp_path, path)
+
+def _cached(kind: str, text: str) -> Future:
+    """
+    Returns a future for the `kind` chain's result on `text`: read from the
+    on-disk topic cache, or on a miss sent through the HuggingFace gateway and
+    stored once it arrives.
+    """
+    path = os.path.join(TOPIC_CACHE_DIR, f"{kind}-{_text_hash(kind, text)}.txt")
+    if os.path.exists(path):
+        _cache_counts["hits"] += 1
+        future = Future()
+        with open(path, encoding="utf-8") as f:
+            future.set_result(f.read())
+        return future
+
+    _cache_counts["misses"] += 1
+    chain = get_service("topic_chains")["topics" if kind == "map" else "merge"]
+    future = submit_limited("huggingface", chain, text)
+    future.add_done_callback(lambda done: _store(path, done))
+    return future
+
+def merge_topics(partials: List[str]) -> str:
+    """
+    Reduces per-section topic lists into one list, merging TOPIC_REDUCE_FANIN lists per call.
     """
-    return chain.invoke(doc)
\ No newline at end of file
+    partials = [partial for partial in partials if partial and partial.strip()]
+    if not partials:
+        return ""
+
+    while len(partials) > 1:
+        groups = [partials[i:i + TOPIC_REDUCE_FANIN] for i in range(0, len(partials), TOPIC_REDUCE_FANIN)]
+        futures = [_cached("reduce", "\n\n---\n\n".join(group)) for group in groups]
+        partials = [future.result() for future in futures]
+    return partials[0]
+
+class TopicExtractor:
+    """
+    Map-reduce important-topic extraction over a stream of chunks.
+
+    Chunks are packed into groups whose boundaries depend on chunk content, so
+    editing one section of a PDF only changes the groups around it. Each group
+    is sent to the model as soon as it closes, through the HuggingFace gateway
+    (which applies its concurrency limit, rate budget and 429 backoff), and its
+    result is cached on disk by content hash, so re-ingesting an edited PDF only re-processes the changed groups.
+    `finish` merges the per-group topics in a final reduce step.
+    """
+
+    def __init__(self, state: Optional[Dict] = None):
+        state = state or {}
+        self._futures = []
+        self._topics = list(state.get("topics", []))
+        self._buffer = list(state.get("buffer", []))
+        self._buffer_chars = sum(len(text) for text in self._buffer)
+        for text in state.get("pending", []):
+            self._submit(text)
+
+    def add_chunk(self, text: str):
+        self._buffer.append(text)
+        self._buffer_chars += len(text)
+        if self._buffer_chars >= TOPIC_GROUP_MAX_CHARS or (
+            self._buffer_chars >= TOPIC_GROUP_MIN_CHARS
+            and int(_text_hash(text)[:8], 16) % TOPIC_GROUP_DIVISOR == 0
+        ):
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._submit("\n\n".join(self._buffer))
+        self._buffer, self._buffer_chars = [], 0
+
+    def _submit(self, text: str):
+        self._futures.append((text, _cached("map", text)))
+
+    def state(self) -> Dict:
+        """
+        Returns a JSON-serializable snapshot that a new extractor can resume from:
+        finished group topics in order, texts of groups still in flight and the open buffer.
+        """
+        topics = list(self._topics)
+        pending = []
+        for text, future in self._futures:
+            if not pending and future.done() and future.exception() is None:
+                topics.append(future.result())
+            else:
+                pending.append(text)
+        return {"topics": topics, "pending": pending, "buffer": list(self._buffer)}
+
+    def finish(self) -> str:
+        self._flush()
+        partials = self._topics + [future.result() for _, future in self._futures]
+        return merge_topics(partials)
@@ -1,46 +1,157 @@
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from prompts.exam_generator import exam_generator_prompt
 from schemas.exam_request_schema import ExamPaperRequest
-from utils.pdf_vectorizer import search_similar_chunks
-from utils.exam_validator import validate_exam_structure
-from prompts.exam_generator import parser
+from utils.pdf_vectorizer import search_similar_chunks_with_embeddings, get_vectorstore_version, embed_texts
+from utils.context_builder import build_context
+from utils.context_cache import retrieval_context_cache, make_cache_key
+from utils.exam_validator import validate_exam_structure, repair_section
+from utils.concurrency import run_blocking
+from utils.llm_gateway import ainvoke_limited, astream_limited, ProviderRateLimitError
+from utils.json_stream import JsonArrayItemStream
+from utils.question_index import get_exam_key, get_question_index
+from utils.services import register_service, get_service, register_warmup
+from utils.metrics import span, instrument, instrument_llm, record_retry, record_llm_tokens, record_context_stats
+from llms.providers import create_chat_model, LLM_BACKEND
+from llms.fake_responses import fake_exam_paper, fake_exam_section
+from prompts.exam_generator import parser, response_schemas
+from fastapi import HTTPException
+from prompts.exam_generator import section_generator_prompt, section_parser
+import os
+import uuid
 import random
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 load_dotenv()
 
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0.5,
-)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+GENERATION_MODE = os.getenv("GENERATION_MODE", "sections")
+GENERATION_REPAIR_ATTEMPTS = int(os.getenv("GENERATION_REPAIR_ATTEMPTS", "2"))
+# Off by default for the fake, record and replay backends: their papers repeat by
+# design, and replacement prompts would never match a recorded cassette.
+QUESTION_UNIQUENESS = os.getenv("QUESTION_UNIQUENESS", str(LLM_BACKEND == "live")).lower() == "true"
+QUESTION_UNIQUENESS_ROUNDS = int(os.getenv("QUESTION_UNIQUENESS_ROUNDS", "2"))
 
-chain = exam_generator_prompt | llm | parser
+def _create_chains():
+    def llm(fake_responder):
+        return create_chat_model("groq", fake_responder, model="llama-3.1-8b-instant", temperature=0.5)
 
-async def generate_exam_paper(req: ExamPaperRequest):
-    
+    def chain(prompt, model, output_parser):
+        return (
+            instrument(prompt, "generator", "prompt_build")
+            | instrument_llm(model, "generator")
+            | instrument(output_parser, "generator", "parse")
+        )
+
+    paper_model, section_model = llm(fake_exam_paper), llm(fake_exam_section)
+    return {
+        "paper": chain(exam_generator_prompt, paper_model, parser),
+        "section": chain(section_generator_prompt, section_model, section_parser),
+        # Raw models for streaming, which bypasses the output parsers.
+        "paper_model": paper_model,
+        "section_model": section_model,
+    }
+
+register_service("paper_generator_chains", _create_chains)
+register_warmup("paper_generator_chains", lambda: get_service("paper_generator_chains"))
+
+SECTION_FORMATS = {schema.name: schema.description for schema in response_schemas}
+
+async def get_syllabus_context(important_topics: List[str], weights: List[float], pdf_ids: List[str], k: int = 9) -> str:
+    """
+    Returns the retrieval context for a syllabus, searched only within the exam's own PDFs
+    and compressed into CONTEXT_TOKEN_BUDGET tokens shared by topic according to `weights`.
+    Every student of an exam sends the same topics, so the context is cached per
+    (topics, weights, PDFs, k, vector store version).
+    """
+    async def build():
+        query_embeddings, candidates = await run_blocking(
+            search_similar_chunks_with_embeddings, important_topics, k=k, pdf_ids=pdf_ids
+        )
+        with span("generator", "context_build"):
+            chunks, stats = build_context(query_embeddings, candidates, weights, CONTEXT_TOKEN_BUDGET)
+        record_context_stats("generator", stats)
+        return chunks
+
+    key = make_cache_key(
+        "syllabus-context", important_topics, weights, sorted(pdf_ids), k, CONTEXT_TOKEN_BUDGET, get_vectorstore_version()
+    )
+    return await retrieval_context_cache.get_or_compute(key, build)
+
+async def _prepare(req: ExamPaperRequest) -> Tuple[str, str]:
+    """
+    Returns the retrieval context and the chapter-wise marks text for a paper request.
+    """
     if not req.syllabus or not req.syllabus:
         raise ValueError("Syllabus and chapters must be provided in the request.")
     
     important_topics = []
+    topic_weights = []
     
     for chapter in req.syllabus:
         if hasattr(chapter, 'importantTopics') and chapter.importantTopics:
             important_topics.append(chapter.importantTopics)
+            topic_weights.append(max(chapter.marks, 1))
             
     if not important_topics:
         raise ValueError("No important topics found in the syllabus chapters.")
 
-    chunks = ""
     ch_wise_marks = ""
     for chapter in req.syllabus:
         ch_wise_marks += f"{chapter.chapter}: {chapter.marks}\n"
     
-    for topic in important_topics:
-        context = search_similar_chunks(query=topic , k = 9)
-        if context:
-            chunks += "\n".join([doc.page_content for doc in context]) + "\n"
-    
-    generated_exam = chain.invoke({
+    pdf_ids = [chapter.publicId for chapter in req.syllabus if chapter.publicId]
+    chunks = await get_syllabus_context(important_topics, topic_weights, pdf_ids)
+    return chunks, ch_wise_marks
+
+async def generate_exam_paper(req: ExamPaperRequest):
+    generated_exam, reservation = await generate_reserved_exam_paper(req)
+    commit_exam_questions(req, generated_exam, reservation)
+    return generated_exam
+
+async def generate_reserved_exam_paper(req: ExamPaperRequest) -> Tuple[Dict, Optional[str]]:
+    """
+    Generates a validated paper whose questions are only reserved in the exam's
+    question index. Returns the paper and the reservation (None when uniqueness
+    is off); pass it to `commit_exam_questions` once the paper is handed out, or
+    to `release_exam_questions` if it never is.
+    """
+    chunks, ch_wise_marks = await _prepare(req)
+
+    if GENERATION_MODE == "single":
+        generated_exam = await _generate_single(req, chunks, ch_wise_marks)
+    else:
+        generated_exam = await _generate_by_section(req, chunks, ch_wise_marks)
+
+    if not QUESTION_UNIQUENESS:
+        return generated_exam, None
+    reservation = uuid.uuid4().hex
+    try:
+        if await _ensure_unique(req, generated_exam, chunks, ch_wise_marks, reservation):
+            with span("generator", "validate"):
+                validate_exam_structure(generated_exam, req)
+    except BaseException:
+        release_exam_questions(req, reservation)
+        raise
+    return generated_exam, reservation
+
+def commit_exam_questions(req: ExamPaperRequest, generated_exam: Dict, reservation: Optional[str]):
+    """
+    Records the questions of a paper that was handed out, so later papers of the exam avoid them.
+    """
+    if reservation is not None:
+        texts = [text for _, _, text in _paper_questions(req, generated_exam)]
+        get_question_index(get_exam_key(req)).commit(reservation, texts)
+
+def release_exam_questions(req: ExamPaperRequest, reservation: Optional[str]):
+    """
+    Frees the questions reserved for a paper that was rejected or discarded.
+    """
+    if reservation is not None:
+        get_question_index(get_exam_key(req)).release(reservation)
+
+def _paper_inputs(req: ExamPaperRequest, chunks: str, ch_wise_marks: str) -> Dict:
+    return {
         "marks": req.marks,
         "duration": req.duration,
         "subject": req.subject,
@@ -54,8 +165,275 @@ async def generate_exam_paper(req: ExamPaperRequest):
         "context": chunks,
         "ch_wise_marks": ch_wise_marks,
         "random_seed": random.randint(0, 10000)  
-    })
+    }
+
+async def _generate_single(req: ExamPaperRequest, chunks: str, ch_wise_marks: str):
+    """
+    Generates the whole paper in one LLM call.
+    """
+    generated_exam = await ainvoke_limited(
+        "groq", get_service("paper_generator_chains")["paper"], _paper_inputs(req, chunks, ch_wise_marks)
+    )
     
-    validate_exam_structure(generated_exam, req)
+    with span("generator", "validate"):
+        validate_exam_structure(generated_exam, req)
     
     return generated_exam
+
+def _section_specs(req: ExamPaperRequest) -> Dict[str, Dict]:
+    schema = req.questionPaperSchema
+    return {
+        "mcq_questions": {"name": "Multiple Choice Questions (MCQs)", "count": schema.mcq.count, "mark": schema.mcq.mark},
+        "subjective_questions": {"name": "Subjective Questions", "count": schema.subjective.count, "mark": schema.subjective.mark},
+        "coding_questions": {"name": "Coding Questions", "count": schema.code.count, "mark": schema.code.mark},
+    }
+
+def _section_inputs(req: ExamPaperRequest, section: str, spec: Dict, count: int, questions: List[Dict],
+                    chunks: str, ch_wise_marks: str, avoid: List[str] = ()) -> Dict:
+    return {
+        "section_name": spec["name"],
+        "count": count,
+        "marks_each": spec["mark"],
+        "question_format": SECTION_FORMATS[section],
+        "marks": req.marks,
+        "duration": req.duration,
+        "subject": req.subject,
+        "difficulty_instruction": req.questionPaperSchema.difficultyInstruction,
+        "context": chunks,
+        "ch_wise_marks": ch_wise_marks,
+        "random_seed": random.randint(0, 10000),
+        "avoid_questions": "\n".join(f"- {text}" for text in [q['text'] for q in questions] + list(avoid)) or "None",
+    }
+
+async def _generate_section(req: ExamPaperRequest, section: str, spec: Dict, chunks: str, ch_wise_marks: str,
+                            questions: Optional[List[Dict]] = None, avoid: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Generates one section and repairs it in place: invalid questions are dropped,
+    marks are fixed, extra questions are trimmed, and only the missing questions
+    are requested again (up to GENERATION_REPAIR_ATTEMPTS times). `questions`
+    are already accepted questions to keep and complete; `avoid` are texts of
+    rejected questions the model must not repeat.
+    """
+    questions = list(questions or [])
+    for attempt in range(GENERATION_REPAIR_ATTEMPTS + 1):
+        missing = spec["count"] - len(questions)
+        if missing <= 0:
+            break
+        if attempt:
+            record_retry("generator", section)
+        try:
+            output = await ainvoke_limited(
+                "groq",
+                get_service("paper_generator_chains")["section"],
+                _section_inputs(req, section, spec, missing, questions, chunks, ch_wise_marks, avoid or ()),
+            )
+        except ProviderRateLimitError:
+            raise
+        except Exception:
+            if attempt == GENERATION_REPAIR_ATTEMPTS:
+                raise
+            continue
+        with span("generator", "validate"):
+            questions = repair_section(section, questions + list(output.get("questions") or []), spec["mark"])
+    return questions[:spec["count"]]
+
+async def _generate_by_section(req: ExamPaperRequest, chunks: str, ch_wise_marks: str):
+    """
+    Generates the MCQ, subjective and coding sections concurrently and assembles
+    the paper, so latency is close to the slowest section and a broken section is
+    repaired on its own instead of regenerating the whole paper.
+    """
+    specs = _section_specs(req)
+    sections = await asyncio.gather(*[
+        _generate_section(req, section, spec, chunks, ch_wise_marks) for section, spec in specs.items()
+    ])
+    generated_exam = dict(zip(specs, sections))
+
+    with span("generator", "validate"):
+        validate_exam_structure(generated_exam, req)
+
+    return generated_exam
+
+def _paper_questions(req: ExamPaperRequest, generated_exam: Dict) -> List[Tuple[str, int, str]]:
+    return [
+        (section, i, question.get("text", ""))
+        for section in _section_specs(req)
+        for i, question in enumerate(generated_exam.get(section) or [])
+    ]
+
+async def _check_questions(req: ExamPaperRequest, questions: List[Tuple[str, int, str]], reservation: str) -> List[int]:
+    """
+    Checks (section, index, text) questions against the exam's question index in
+    one vectorized pass and reserves the unique ones under `reservation`. Returns
+    the positions in `questions` that repeat an earlier paper or another question
+    of this paper.
+    """
+    index = get_question_index(get_exam_key(req))
+    texts = [text for _, _, text in questions]
+    with span("generator", "uniqueness"):
+        prefiltered = index.prefilter(texts)
+    positions = [i for i in range(len(texts)) if i not in prefiltered]
+    embeddings = await run_blocking(embed_texts, [texts[i] for i in positions]) if positions else []
+    with span("generator", "uniqueness"):
+        return await run_blocking(index.check, texts, dict(zip(positions, embeddings)), reservation)
+
+async def _ensure_unique(req: ExamPaperRequest, generated_exam: Dict, chunks: str, ch_wise_marks: str,
+                         reservation: str) -> bool:
+    """
+    Replaces the questions of `generated_exam` that (nearly) repeat a question
+    of an earlier paper of the same exam. Only the colliding questions are
+    regenerated, with the rejected texts added to the avoid list, and only the
+    replacements are checked again, for up to QUESTION_UNIQUENESS_ROUNDS rounds.
+    Returns whether any question was replaced.
+    """
+    specs = _section_specs(req)
+    pending = _paper_questions(req, generated_exam)
+    replaced = False
+    for attempt in range(QUESTION_UNIQUENESS_ROUNDS + 1):
+        if not pending:
+            break
+        colliding = [pending[i] for i in await _check_questions(req, pending, reservation)]
+        if not colliding or attempt == QUESTION_UNIQUENESS_ROUNDS:
+            break
+        record_retry("generator", "uniqueness")
+        replaced = True
+
+        dropped: Dict[str, Dict[int, str]] = {}
+        for section, i, text in colliding:
+            dropped.setdefault(section, {})[i] = text
+
+        async def regenerate(section: str):
+            kept = [q for i, q in enumerate(generated_exam[section]) if i not in dropped[section]]
+            questions = await _generate_section(
+                req, section, specs[section], chunks, ch_wise_marks, kept, avoid=list(dropped[section].values())
+            )
+            generated_exam[section] = questions
+            return [(section, i, q.get("text", "")) for i, q in enumerate(questions) if i >= len(kept)]
+
+        pending = [question for new in await asyncio.gather(*[regenerate(s) for s in dropped]) for question in new]
+    return replaced
+
+class _StreamedPaper:
+    """
+    Questions accepted so far while streaming, per section. Each streamed
+    question goes through the same repair rules as a finished section before
+    it is accepted, and a section never takes more than its count.
+    """
+
+    def __init__(self, specs: Dict[str, Dict]):
+        self.specs = specs
+        self.sections = {section: [] for section in specs}
+        self.events = asyncio.Queue()
+
+    def accept(self, section: Optional[str], question: Dict):
+        spec = self.specs.get(section)
+        if spec is None or len(self.sections[section]) >= spec["count"]:
+            return
+        accepted = self.sections[section]
+        with span("generator", "validate"):
+            repaired = repair_section(section, accepted + [question], spec["mark"])
+        if len(repaired) > len(accepted):
+            accepted.append(repaired[-1])
+            self.events.put_nowait(("question", {
+                "section": section,
+                "index": len(accepted) - 1,
+                "question": repaired[-1],
+            }))
+
+async def _stream_model(model, prompt, on_item, item_section=None):
+    """
+    Streams one model reply and hands every completed array item to `on_item`.
+    """
+    items = JsonArrayItemStream()
+    text = ""
+    with span("generator", "llm_stream"):
+        async for chunk in astream_limited("groq", model, prompt):
+            content = getattr(chunk, "content", chunk)
+            text += content
+            for key, item in items.feed(content):
+                on_item(item_section or key, item)
+    record_llm_tokens("generator", prompt, text)
+
+async def stream_exam_paper(req: ExamPaperRequest) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Generates a paper while streaming the model output, yielding ("question", ...)
+    events as soon as each question is complete and valid, then one ("done", ...)
+    event with the section counts, the validation verdict and the whole paper.
+
+    Sections that come up short after streaming are completed with the regular
+    (non-streaming) repair loop, whose questions are emitted the same way.
+    """
+    chunks, ch_wise_marks = await _prepare(req)
+    specs = _section_specs(req)
+    paper = _StreamedPaper(specs)
+    chains = get_service("paper_generator_chains")
+
+    async def stream_section(section: str, spec: Dict):
+        if spec["count"] > 0:
+            prompt = section_generator_prompt.format_prompt(
+                **_section_inputs(req, section, spec, spec["count"], [], chunks, ch_wise_marks)
+            )
+            try:
+                await _stream_model(chains["section_model"], prompt, paper.accept, section)
+            except ProviderRateLimitError:
+                raise
+            except Exception:
+                # Completed without streaming below.
+                record_retry("generator", "stream_fallback")
+        await complete_section(section, spec)
+
+    async def complete_section(section: str, spec: Dict):
+        streamed = list(paper.sections[section])
+        if len(streamed) < spec["count"]:
+            questions = await _generate_section(req, section, spec, chunks, ch_wise_marks, streamed)
+            for question in questions[len(streamed):]:
+                paper.accept(section, question)
+
+    async def produce():
+        try:
+            if GENERATION_MODE == "single":
+                prompt = exam_generator_prompt.format_prompt(**_paper_inputs(req, chunks, ch_wise_marks))
+                try:
+                    await _stream_model(chains["paper_model"], prompt, paper.accept)
+                except ProviderRateLimitError:
+                    raise
+                except Exception:
+                    record_retry("generator", "stream_fallback")
+                await asyncio.gather(*[complete_section(section, spec) for section, spec in specs.items()])
+            else:
+                await asyncio.gather(*[stream_section(section, spec) for section, spec in specs.items()])
+        finally:
+            paper.events.put_nowait(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            event = await paper.events.get()
+            if event is None:
+                break
+            yield event
+        await producer
+    finally:
+        producer.cancel()
+
+    generated_exam = dict(paper.sections)
+    reservation = None
+    if QUESTION_UNIQUENESS:
+        # The questions were already sent, so they are only recorded for later papers.
+        reservation = uuid.uuid4().hex
+        await _check_questions(req, _paper_questions(req, generated_exam), reservation)
+    verdict = {"valid": True, "error": None}
+    try:
+        with span("generator", "validate"):
+            validate_exam_structure(generated_exam, req)
+    except HTTPException as e:
+        verdict = {"valid": False, "error": e.detail}
+    if verdict["valid"]:
+        commit_exam_questions(req, generated_exam, reservation)
+    else:
+        release_exam_questions(req, reservation)
+    yield "done", {
+        "sections": {section: len(questions) for section, questions in generated_exam.items()},
+        **verdict,
+        "examPaper": generated_exam,
+    }
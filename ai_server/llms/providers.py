@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import time
+import hashlib
+import asyncio
+from typing import Callable
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+load_dotenv()
+
+# live: call the provider. fake: answer locally with schema-valid JSON.
+# record: call the provider and save every response. replay: serve saved responses only.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live")
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+LLM_CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", "exgenai_llm_cassettes")
+LLM_REPLAY_REALTIME = os.getenv("LLM_REPLAY_REALTIME", "false").lower() == "true"
+
+_random_seed_line = re.compile(r"^.*random seed.*$", re.MULTILINE)
+
+
+def _prompt_text(prompt) -> str:
+    return prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+
+
+def _cassette_path(provider: str, model_kwargs: dict, prompt: str) -> str:
+    # The per-call random seed would make every key unique, so it is left out.
+    normalized = _random_seed_line.sub("", prompt)
+    key = hashlib.sha256(json.dumps([provider, model_kwargs, normalized], sort_keys=True).encode("utf-8")).hexdigest()
+    return os.path.join(LLM_CASSETTE_DIR, f"{key}.json")
+
+
+def _live_model(provider: str, **model_kwargs):
+    if provider == "groq":
+        from langchain_groq import ChatGroq
+        return ChatGroq(**model_kwargs)
+    if provider == "huggingface":
+        from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+        return ChatHuggingFace(llm=HuggingFaceEndpoint(**model_kwargs))
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def _fake_model(responder: Callable[[str], str]):
+    def invoke(prompt):
+        time.sleep(FAKE_LLM_LATENCY)
+        return AIMessage(content=responder(_prompt_text(prompt)))
+
+    async def ainvoke(prompt):
+        await asyncio.sleep(FAKE_LLM_LATENCY)
+        return AIMessage(content=responder(_prompt_text(prompt)))
+
+    return RunnableLambda(invoke, afunc=ainvoke, name="FakeLLM")
+
+
+def _recording_model(model, provider: str, model_kwargs: dict):
+    def save(prompt: str, content: str, latency: float):
+        os.makedirs(LLM_CASSETTE_DIR, exist_ok=True)
+        path = _cassette_path(provider, model_kwargs, prompt)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"provider": provider, "prompt": prompt, "content": content, "latency": latency}, f)
+        os.replace(tmp_path, path)
+
+    def invoke(prompt):
+        started = time.perf_counter()
+        message = model.invoke(prompt)
+        save(_prompt_text(prompt), message.content, time.perf_counter() - started)
+        return message
+
+    async def ainvoke(prompt):
+        started = time.perf_counter()
+        message = await model.ainvoke(prompt)
+        save(_prompt_text(prompt), message.content, time.perf_counter() - started)
+        return message
+
+    return RunnableLambda(invoke, afunc=ainvoke, name="RecordingLLM")
+
+
+def _replay_model(provider: str, model_kwargs: dict):
+    def load(prompt) -> dict:
+        path = _cassette_path(provider, model_kwargs, _prompt_text(prompt))
+        if not os.path.exists(path):
+            raise LookupError(f"No recorded {provider} response for this prompt ({os.path.basename(path)})")
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def invoke(prompt):
+        cassette = load(prompt)
+        if LLM_REPLAY_REALTIME:
+            time.sleep(cassette["latency"])
+        return AIMessage(content=cassette["content"])
+
+    async def ainvoke(prompt):
+        cassette = load(prompt)
+        if LLM_REPLAY_REALTIME:
+            await asyncio.sleep(cassette["latency"])
+        return AIMessage(content=cassette["content"])
+
+    return RunnableLambda(invoke, afunc=ainvoke, name="ReplayLLM")
+
+
+def create_chat_model(provider: str, fake_responder: Callable[[str], str], **model_kwargs):
+    """
+    Returns the chat model for `provider` according to LLM_BACKEND.
+
+    Args:
+        provider (str): "groq" or "huggingface".
+        fake_responder (Callable): Builds the fake backend's answer from the prompt text.
+        **model_kwargs: Arguments for the live client (model, temperature, repo_id, ...).
+    """
+    if LLM_BACKEND == "fake":
+        return _fake_model(fake_responder)
+    if LLM_BACKEND == "replay":
+        return _replay_model(provider, model_kwargs)
+    model = _live_model(provider, **model_kwargs)
+    if LLM_BACKEND == "record":
+        return _recording_model(model, provider, model_kwargs)
+    return model
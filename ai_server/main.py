@@ -1,7 +1,13 @@
 from fastapi import FastAPI
 from routes.vectorstore_routes import router as vectorstore_router
 from routes.exam_routes import router as exam_router
+from routes.paper_bank_routes import router as paper_bank_router
+from routes.health_routes import router as health_router
+from routes.metrics_routes import router as metrics_router
 
 def register_routes(app: FastAPI):
     app.include_router(vectorstore_router, prefix="/api/v1", tags=["Vectorstore"])
     app.include_router(exam_router, prefix="/api/v1", tags=["Exam"])
+    app.include_router(paper_bank_router, prefix="/api/v1", tags=["Paper Bank"])
+    app.include_router(health_router, tags=["Health"])
+    app.include_router(metrics_router, tags=["Metrics"])
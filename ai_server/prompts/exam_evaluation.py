@@ -72,4 +72,67 @@ You must return only a valid JSON object that matches the format described above
 Output the exam paper in the following structured format (Pure JSON format):
 {format_instructions}
 """
-)
\ No newline at end of file
+)
+
+question_response_schemas = [
+    ResponseSchema(
+        name="results",
+        description="List with one entry per evaluated question, in the same order as given. Each entry should have questionId (exactly as given), marksAwarded (a number between 0 and the question's max marks) and aiFeedback. For Ex -> results: [{'questionId': '1', 'marksAwarded': 3, 'aiFeedback': 'Feedback text'}]"
+    )
+]
+
+question_parser = StructuredOutputParser.from_response_schemas(question_response_schemas)
+
+question_evaluation_prompt = PromptTemplate(
+    input_variables=["instructions", "questions"],
+    partial_variables={"format_instructions": question_parser.get_format_instructions()},
+    template="""
+You are an expert and strict exam paper evaluator. Evaluate only the questions given below.
+
+Additonal evaluation instructions by the instructor: {instructions}
+
+Each question comes with its type (subjective or code), its maximum marks, the student's answer and the notes from the syllabus that are relevant to it:
+{questions}
+
+- Evaluate each answer based on its own notes and the instructions. Give proper feedback and marks for each question.
+- Do not hallucinate or make assumptions about the answers. Use only the provided notes and instructions for evaluation.
+- Never give more than the maximum marks of a question. Missing, irrelevant, wrong or hallucinated answers get 0 marks.
+- A one-line answer to a high-mark question gets 0 or 1 mark; partially correct answers get partial marks, never full marks.
+- **Subjective Questions**: Answers must be content-rich, conceptually relevant, and appropriately detailed.
+- **Coding Questions**: Answers must be syntactically correct, logically valid, and match the expected output.
+- Valid logic with bad syntax = partial marks (1-2); perfect code = full marks; completely wrong code = 0 marks.
+- Be unbiased and fair, do not assume or imagine missing information.
+
+You must return only a valid JSON object that matches the format described above. Do not add explanations, headers, or any additional text. Just return the JSON.
+{format_instructions}
+"""
+)
+
+summary_response_schemas = [
+    ResponseSchema(
+        name="feedbackSummary",
+        description="Overall feedback on the exam performance, strengths, and areas for improvement, constructive and helpful for the student. NOTE: no more than 2 lines."
+    ),
+    ResponseSchema(
+        name="category",
+        description="One of weak, average or topper, based on the marks awarded compared to the maximum marks."
+    ),
+]
+
+summary_parser = StructuredOutputParser.from_response_schemas(summary_response_schemas)
+
+summary_prompt = PromptTemplate(
+    input_variables=["graded_questions", "marks_awarded", "max_marks"],
+    partial_variables={"format_instructions": summary_parser.get_format_instructions()},
+    template="""
+You are an exam evaluator writing the overall feedback for a student whose answers are already graded.
+
+Marks awarded: {marks_awarded} out of {max_marks}
+
+Per-question marks and feedback:
+{graded_questions}
+
+You must return only a valid JSON object that matches the format described above. Do not add explanations, headers, or any additional text. Just return the JSON.
+{format_instructions}
+"""
+)
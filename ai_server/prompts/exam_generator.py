@@ -61,3 +61,52 @@ Output the exam paper in the following structured format (Pure JSON format):
 {format_instructions}
 """
 )
+
+section_response_schemas = [
+    ResponseSchema(
+        name="questions",
+        description="List of questions for this section, each in the question format described above."
+    ),
+]
+
+section_parser = StructuredOutputParser.from_response_schemas(section_response_schemas)
+
+section_generator_prompt = PromptTemplate(
+    input_variables=[
+        "section_name", "count", "marks_each", "question_format",
+        "marks", "duration", "subject",
+        "difficulty_instruction", "context", "ch_wise_marks", "random_seed", "avoid_questions"
+    ],
+    partial_variables={"format_instructions": section_parser.get_format_instructions()},
+    template="""
+You are an expert exam paper generator. Your task is to create one section of an exam paper based on the provided syllabus and requirements.
+
+Section: {section_name}
+Generate exactly {count} questions, each worth {marks_each} marks.
+
+Question format: {question_format}
+
+The full exam paper is worth {marks} marks, lasts {duration} minutes and is for the subject {subject}. Other sections are generated separately, so only generate this section.
+
+IMPORTANT NOTE: The questions should be unique and not copy any existing exam papers. They should be based on the provided syllabus and important topics. We are generating different exam papers for the same syllabus, so make sure every question is unique, and combine multiple topics in one question to make questions little tricky.
+Every question should test the student's understanding of the subject and their ability to apply concepts in practical scenarios.
+
+Do not repeat or rephrase any of these already generated questions:
+{avoid_questions}
+
+{random_seed} for random seed to ensure uniqueness in question generation.
+
+Chapter-wise Mark Distribution:
+{ch_wise_marks}
+
+Difficulty Instruction:
+{difficulty_instruction}
+
+Here is the context from the syllabus and important topics:
+{context}
+
+You must return only a valid JSON object that matches the format described above. Do not add explanations, headers, or any additional text. Just return the JSON.
+Output the section in the following structured format (Pure JSON format):
+{format_instructions}
+"""
+)
@@ -17,3 +17,23 @@ Content:
 {doc}
 """
 )
+
+important_topic_merge_prompt = PromptTemplate.from_template(
+"""You are an expert question paper maker who identifies important topics from academic notes.
+
+The following topic lists were extracted from different sections of the same document.
+Merge them into the 6-8 most important topics for the whole document.
+Combine topics that are the same or overlap, and drop minor ones.
+
+Each topic must include:
+- A short heading
+- A brief 1-2 line description and examples of the questions that can be asked from this topic very briefly.
+
+Only return a plain string where each topic is on a new line.
+Response should not include any additional text or formatting.
+Just the topics and their descriptions in short texts.
+
+Topic lists:
+{topics}
+"""
+)
@@ -1,14 +1,43 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Header
 from schemas.exam_request_schema import ExamPaperRequest
-from schemas.exam_evaluation import ExamEvaluationRequest
-from controllers.exam_controller import generate_paper, evaluate_exam
+from schemas.exam_evaluation import ExamEvaluationRequest, BatchEvaluationRequest
+from controllers.exam_controller import (
+    generate_paper,
+    stream_paper,
+    evaluate_exam,
+    evaluate_exam_batch,
+    get_batch_evaluation,
+    stream_batch_evaluation,
+    get_cache_stats,
+)
 
 router = APIRouter()
 
 @router.post("/generate-paper")
-async def generate_exam(req: ExamPaperRequest):
-    return await generate_paper(req)
+async def generate_exam(req: ExamPaperRequest, idempotency_key: Optional[str] = Header(None)):
+    return await generate_paper(req, idempotency_key)
+
+@router.post("/generate-paper/stream")
+async def generate_exam_stream(req: ExamPaperRequest):
+    return await stream_paper(req)
 
 @router.post("/evaluate-exam")
-async def evaluate(req: ExamEvaluationRequest):
-    return await evaluate_exam(req)
+async def evaluate(req: ExamEvaluationRequest, idempotency_key: Optional[str] = Header(None)):
+    return await evaluate_exam(req, idempotency_key)
+
+@router.post("/evaluate-exam/batch")
+async def evaluate_batch(req: BatchEvaluationRequest):
+    return await evaluate_exam_batch(req)
+
+@router.get("/evaluate-exam/batch/{job_id}")
+async def get_batch(job_id: str, include_results: bool = False):
+    return await get_batch_evaluation(job_id, include_results)
+
+@router.get("/evaluate-exam/batch/{job_id}/stream")
+async def stream_batch(job_id: str):
+    return await stream_batch_evaluation(job_id)
+
+@router.get("/cache-stats")
+async def cache_stats():
+    return await get_cache_stats()
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from controllers.health_controller import handle_liveness, handle_readiness
+
+router = APIRouter()
+
+@router.get("/health/live")
+async def liveness():
+    return await handle_liveness()
+
+@router.get("/health/ready")
+async def readiness():
+    return await handle_readiness()
@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+from controllers.metrics_controller import handle_metrics
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics():
+    return await handle_metrics()
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from schemas.exam_request_schema import PaperBankRegisterRequest
+from controllers.paper_bank_controller import (
+    handle_register_exam,
+    handle_get_pool_stats,
+    handle_get_all_pool_stats,
+    handle_unregister_exam,
+)
+
+router = APIRouter()
+
+@router.post("/paper-bank/register")
+async def register_exam(req: PaperBankRegisterRequest):
+    return await handle_register_exam(req)
+
+@router.get("/paper-bank/stats")
+async def get_all_pool_stats():
+    return await handle_get_all_pool_stats()
+
+@router.get("/paper-bank/{exam_key}/stats")
+async def get_pool_stats(exam_key: str):
+    return await handle_get_pool_stats(exam_key)
+
+@router.delete("/paper-bank/{exam_key}")
+async def unregister_exam(exam_key: str):
+    return await handle_unregister_exam(exam_key)
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from schemas.requests_schema import PDFUploadRequest, ChunkIDRequest, QueryRequest
+from fastapi import APIRouter, HTTPException, Query
+from typing import Literal, Optional
+from schemas.requests_schema import PDFUploadRequest, BulkPDFUploadRequest, ChunkIDRequest, QueryRequest, BatchQueryRequest
 from controllers.vectorstore_controller import (
     handle_vectorize_pdf,
+    handle_vectorize_pdfs,
+    handle_create_ingestion_job,
+    handle_get_ingestion_job,
+    handle_list_ingestion_jobs,
+    handle_retry_ingestion_job,
     handle_get_chunk,
     handle_delete_chunks,
     handle_delete_all_chunks,
     handle_get_all_chunks,
     handle_search_chunks,
+    handle_search_chunks_batch,
 )
 
 router = APIRouter()
@@ -15,6 +22,26 @@ router = APIRouter()
 async def vectorize_pdf(req: PDFUploadRequest):
     return await handle_vectorize_pdf(req)
 
+@router.post("/vectorize-pdf/bulk")
+async def vectorize_pdfs(req: BulkPDFUploadRequest):
+    return await handle_vectorize_pdfs(req)
+
+@router.post("/vectorize-pdf/jobs")
+async def create_ingestion_job(req: PDFUploadRequest):
+    return await handle_create_ingestion_job(req)
+
+@router.get("/vectorize-pdf/jobs")
+async def list_ingestion_jobs():
+    return await handle_list_ingestion_jobs()
+
+@router.get("/vectorize-pdf/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    return await handle_get_ingestion_job(job_id)
+
+@router.post("/vectorize-pdf/jobs/{job_id}/retry")
+async def retry_ingestion_job(job_id: str):
+    return await handle_retry_ingestion_job(job_id)
+
 @router.get("/get-chunk/{chunk_id}")
 async def get_chunk(chunk_id: str):
     return await handle_get_chunk(chunk_id)
@@ -28,9 +55,21 @@ async def delete_all_chunks():
     return await handle_delete_all_chunks()
 
 @router.get("/chunks")
-async def get_chunks():
-    return await handle_get_all_chunks()
+async def get_chunks(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    pdf_id: Optional[str] = None,
+    chapter: Optional[str] = None,
+    fields: Literal["all", "metadata"] = "all",
+    stream: bool = False,
+):
+    filters = {"pdf_id": pdf_id, "chapter": chapter}
+    return await handle_get_all_chunks(limit, offset, filters, fields, stream)
 
 @router.post("/search-chunks")
 async def search_chunks(req: QueryRequest):
     return await handle_search_chunks(req)
+
+@router.post("/search-chunks/batch")
+async def search_chunks_batch(req: BatchQueryRequest):
+    return await handle_search_chunks_batch(req)
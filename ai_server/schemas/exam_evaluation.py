@@ -10,4 +10,13 @@ class QuestionSchema(BaseModel):
 class ExamEvaluationRequest(BaseModel):
     subjective_answers: Optional[List[QuestionSchema]]
     code_answers: Optional[List[QuestionSchema]]
-    evaluation_instructions: Optional[str]
\ No newline at end of file
+    evaluation_instructions: Optional[str]
+    syllabus_ids: Optional[List[str]] = None
+
+class BatchSubmission(BaseModel):
+    submissionId: str
+    request: ExamEvaluationRequest
+
+class BatchEvaluationRequest(BaseModel):
+    submissions: List[BatchSubmission]
+    priority: int = 0
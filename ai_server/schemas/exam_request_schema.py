@@ -30,3 +30,7 @@ class ExamPaperRequest(BaseModel):
     marks: int
     duration: int
     subject: str
+
+class PaperBankRegisterRequest(BaseModel):
+    exam: ExamPaperRequest
+    size: int = Field(default=20, ge=1, le=1000)
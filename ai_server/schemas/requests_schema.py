@@ -1,14 +1,22 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class PDFUploadRequest(BaseModel):
     pdf_path: str
     metadata: Dict
 
+class BulkPDFUploadRequest(BaseModel):
+    pdfs: List[PDFUploadRequest]
+
 class ChunkIDRequest(BaseModel):
     chunk_ids: List[str]
 
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 5
-    
+    pdf_ids: Optional[List[str]] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    pdf_ids: Optional[List[str]] = None
@@ -0,0 +1,79 @@
+import os
+import time
+import asyncio
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VECTORSTORE_WORKERS = int(os.getenv("VECTORSTORE_WORKERS", "4"))
+# Threads for PDF ingestion requests, kept apart from the pool that serves searches.
+INGEST_REQUEST_WORKERS = int(os.getenv("INGEST_REQUEST_WORKERS", "2"))
+
+PROVIDER_LIMITS = {
+    "groq": int(os.getenv("GROQ_MAX_CONCURRENCY", "32")),
+    "huggingface": int(os.getenv("HUGGINGFACE_MAX_CONCURRENCY", "4")),
+}
+
+_executor = ThreadPoolExecutor(max_workers=VECTORSTORE_WORKERS, thread_name_prefix="vectorstore")
+_ingest_executor = ThreadPoolExecutor(max_workers=INGEST_REQUEST_WORKERS, thread_name_prefix="ingest")
+
+
+async def _run_in(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, partial(context.run, func, *args, **kwargs))
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking function (embedding, Chroma lookups and searches) on the worker
+    pool so the event loop stays free to serve other requests. The caller's context
+    (e.g. the request's timing breakdown) is carried over to the worker thread.
+    """
+    return await _run_in(_executor, func, *args, **kwargs)
+
+
+async def run_ingestion(func, *args, **kwargs):
+    """
+    Like `run_blocking`, but on the ingestion pool, so a long PDF ingestion never
+    holds a thread that latency-critical searches are waiting for.
+    """
+    return await _run_in(_ingest_executor, func, *args, **kwargs)
+
+
+class RateLimiter:
+    """
+    Async token bucket allowing `rate_per_minute` acquisitions per minute, with bursts up to the same amount.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = max(rate_per_minute, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount: float = 1):
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate_per_second)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    True for an HTTP 429: errors with `status_code == 429` (ProviderRateLimitError,
+    the Groq client) or with a 429 `response` (huggingface_hub, httpx).
+    """
+    if getattr(error, "status_code", None) == 429:
+        return True
+    return getattr(getattr(error, "response", None), "status_code", None) == 429
@@ -0,0 +1,147 @@
+import os
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+from langchain.schema import Document
+
+load_dotenv()
+
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+NEAR_DUPLICATE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", "0.95"))
+MIN_OVERLAP_CHARS = 50
+CHARS_PER_TOKEN = 4
+
+_totals_lock = threading.Lock()
+_totals = {"requests": 0, "tokensBefore": 0, "tokensAfter": 0, "tokensSaved": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _strip_overlap(selected: List[str], text: str) -> str:
+    """
+    Removes the prefix of `text` that repeats the tail of an already selected chunk
+    (the splitter's chunk_overlap), so the shared passage appears only once.
+    """
+    probe = text[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return text
+    for previous in selected:
+        start = previous.find(probe, max(0, len(previous) - 1000))
+        if start != -1 and text.startswith(previous[start:]):
+            return text[len(previous) - start:].lstrip()
+    return text
+
+
+def build_context(
+    query_embeddings: List[List[float]],
+    candidates: List[List[Tuple[Document, List[float]]]],
+    weights: List[float],
+    token_budget: int,
+    mmr_lambda: float = MMR_LAMBDA,
+) -> Tuple[str, Dict]:
+    """
+    Packs retrieved chunks for several queries into one compact context string.
+
+    Exact and near duplicates are dropped, chunk overlaps are trimmed, and each
+    query picks its chunks by maximal marginal relevance against everything
+    already selected for any query. Query i gets `token_budget * weights[i] / sum(weights)`
+    tokens, e.g. weighted by chapter marks.
+
+    Args:
+        query_embeddings: One embedding per query.
+        candidates: Per query, the retrieved (document, embedding) pairs, best first.
+        weights: Relative share of the budget for each query.
+        token_budget: Approximate token budget for the whole context.
+        mmr_lambda: Trade-off between relevance (1.0) and diversity (0.0).
+
+    Returns:
+        Tuple[str, Dict]: The context and token stats (before, after, saved, chunks kept/dropped).
+    """
+    tokens_before = sum(estimate_tokens(doc.page_content) for pairs in candidates for doc, _ in pairs)
+    total_weight = sum(weights) or 1
+    seen_hashes = set()
+    selected_texts = []
+    selected_vectors = []
+    parts = []
+    dropped = 0
+
+    for query_embedding, pairs, weight in zip(query_embeddings, candidates, weights):
+        budget = token_budget * weight / total_weight
+        pool = []
+        for doc, embedding in pairs:
+            digest = hashlib.sha256(doc.page_content.strip().encode("utf-8")).hexdigest()
+            if digest in seen_hashes:
+                dropped += 1
+                continue
+            pool.append((digest, doc.page_content, embedding))
+        if not pool:
+            continue
+
+        pool_vectors = _normalize([embedding for _, _, embedding in pool])
+        relevance = pool_vectors @ _normalize(query_embedding)[0]
+        remaining = list(range(len(pool)))
+        used = 0
+
+        while remaining and used < budget:
+            if selected_vectors:
+                redundancy = (pool_vectors[remaining] @ np.vstack(selected_vectors).T).max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy
+            best = int(np.argmax(scores))
+            index = remaining.pop(best)
+            digest, text, _ = pool[index]
+
+            if redundancy[best] >= NEAR_DUPLICATE_SIMILARITY:
+                dropped += 1
+                continue
+            text = _strip_overlap(selected_texts, text)
+            if not text:
+                dropped += 1
+                continue
+            tokens = estimate_tokens(text)
+            if used and used + tokens > budget:
+                dropped += 1
+                break
+
+            seen_hashes.add(digest)
+            selected_texts.append(pool[index][1])
+            selected_vectors.append(pool_vectors[index])
+            parts.append(text)
+            used += tokens
+
+        dropped += len(remaining)
+
+    context = "\n".join(parts)
+    tokens_after = estimate_tokens(context)
+    stats = {
+        "tokensBefore": tokens_before,
+        "tokensAfter": tokens_after,
+        "tokensSaved": max(tokens_before - tokens_after, 0),
+        "chunksKept": len(parts),
+        "chunksDropped": dropped,
+    }
+    with _totals_lock:
+        _totals["requests"] += 1
+        _totals["tokensBefore"] += stats["tokensBefore"]
+        _totals["tokensAfter"] += stats["tokensAfter"]
+        _totals["tokensSaved"] += stats["tokensSaved"]
+    return context, stats
+
+
+def context_builder_stats() -> Dict:
+    with _totals_lock:
+        return dict(_totals)
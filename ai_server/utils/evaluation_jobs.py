@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+from collections import deque
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from schemas.exam_evaluation import ExamEvaluationRequest
+from llms.exam_evaluator import evaluate_exam_paper
+from utils.concurrency import RateLimiter, is_rate_limit_error
+from utils.metrics import record_retry
+
+load_dotenv()
+
+EVALUATION_JOB_DIR = os.getenv("EVALUATION_JOB_DIR", "exgenai_evaluation_jobs")
+EVALUATION_BATCH_WORKERS = int(os.getenv("EVALUATION_BATCH_WORKERS", "8"))
+EVALUATION_BATCH_PER_MINUTE = float(os.getenv("EVALUATION_BATCH_PER_MINUTE", "60"))
+EVALUATION_BATCH_MAX_ATTEMPTS = int(os.getenv("EVALUATION_BATCH_MAX_ATTEMPTS", "3"))
+# Times a submission is re-queued after a provider 429 before it is marked failed.
+EVALUATION_BATCH_MAX_RATE_LIMITED = int(os.getenv("EVALUATION_BATCH_MAX_RATE_LIMITED", "10"))
+EVALUATION_BACKOFF_SECONDS = float(os.getenv("EVALUATION_BACKOFF_SECONDS", "5"))
+EVALUATION_BACKOFF_MAX_SECONDS = float(os.getenv("EVALUATION_BACKOFF_MAX_SECONDS", "120"))
+# How long a finished job's results stay available before they are deleted.
+EVALUATION_JOB_TTL = float(os.getenv("EVALUATION_JOB_TTL", "86400"))
+
+
+def _write_json(path: str, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    with open(path) as f:
+        return json.load(f)
+
+
+class EvaluationJob:
+    """
+    One cohort of submissions. Each finished submission is persisted as its own
+    file, so progress survives a restart and nothing is graded twice.
+    """
+
+    def __init__(self, job_id: str, priority: int, submissions: List[Dict], created_at: float,
+                 finished_at: Optional[float] = None):
+        self.job_id = job_id
+        self.priority = priority
+        self.submissions = submissions
+        self.created_at = created_at
+        self.finished_at = finished_at
+        self.results = {}
+        self.attempts = {}
+        self.rate_limited = {}
+        self.pending = deque()
+        self.in_progress = set()
+        self.changed = asyncio.Event()
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(EVALUATION_JOB_DIR, self.job_id)
+
+    def _result_path(self, index: int) -> str:
+        return os.path.join(self.directory, "results", f"{index}.json")
+
+    def save(self):
+        os.makedirs(os.path.join(self.directory, "results"), exist_ok=True)
+        _write_json(os.path.join(self.directory, "job.json"), {
+            "jobId": self.job_id,
+            "priority": self.priority,
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+            "submissions": self.submissions,
+        })
+
+    def record(self, index: int, result: Dict):
+        self.results[index] = result
+        _write_json(self._result_path(index), result)
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    @classmethod
+    def load(cls, directory: str) -> "EvaluationJob":
+        data = _read_json(os.path.join(directory, "job.json"))
+        job = cls(data["jobId"], data["priority"], data["submissions"], data["createdAt"], data.get("finishedAt"))
+        for index in range(len(job.submissions)):
+            path = job._result_path(index)
+            if os.path.exists(path):
+                job.results[index] = _read_json(path)
+            else:
+                job.pending.append(index)
+        return job
+
+    @property
+    def status(self) -> str:
+        if len(self.results) == len(self.submissions):
+            return "completed"
+        if self.results or self.in_progress:
+            return "running"
+        return "queued"
+
+    def summary(self, include_results: bool = False) -> Dict:
+        failed = sum(1 for result in self.results.values() if result["status"] == "failed")
+        summary = {
+            "jobId": self.job_id,
+            "status": self.status,
+            "priority": self.priority,
+            "total": len(self.submissions),
+            "completed": len(self.results) - failed,
+            "failed": failed,
+            "inProgress": len(self.in_progress),
+            "queued": len(self.pending),
+        }
+        if include_results:
+            summary["results"] = [self.results[index] for index in sorted(self.results)]
+        return summary
+
+
+class EvaluationScheduler:
+    """
+    Dispatches queued submissions from all batch jobs to the evaluator.
+
+    The highest-priority jobs are served first and jobs of equal priority take
+    turns, so one large cohort cannot starve a smaller one. Dispatch is limited
+    to EVALUATION_BATCH_WORKERS in flight and EVALUATION_BATCH_PER_MINUTE starts;
+    when the provider answers with a rate-limit error the whole dispatcher pauses
+    with exponential backoff and the submission is re-queued.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._turns = deque()
+        self._wakeup = None
+        self._workers = None
+        self._limiter = RateLimiter(EVALUATION_BATCH_PER_MINUTE)
+        self._paused_until = 0.0
+        self._backoff = EVALUATION_BACKOFF_SECONDS
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._workers = asyncio.Semaphore(EVALUATION_BATCH_WORKERS)
+            self._resume_persisted()
+            self._task = asyncio.ensure_future(self._dispatch())
+
+    def submit(self, submissions: List[Dict], priority: int = 0) -> EvaluationJob:
+        job = EvaluationJob(uuid.uuid4().hex, priority, submissions, time.time())
+        job.pending.extend(range(len(submissions)))
+        job.save()
+        self._add(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[EvaluationJob]:
+        """
+        Returns a job in the queue, or a finished one from disk until it expires.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            directory = os.path.join(EVALUATION_JOB_DIR, os.path.basename(job_id))
+            if os.path.exists(os.path.join(directory, "job.json")):
+                job = EvaluationJob.load(directory)
+                if job.status != "completed" or self._expired(job):
+                    return None
+        return job
+
+    def _add(self, job: EvaluationJob):
+        self.jobs[job.job_id] = job
+        self._turns.append(job.job_id)
+        if self._wakeup:
+            self._wakeup.set()
+
+    def _resume_persisted(self):
+        """
+        Re-queues unfinished jobs. Finished ones are left on disk (served by `get`)
+        until they expire, and expired ones are deleted.
+        """
+        if not os.path.isdir(EVALUATION_JOB_DIR):
+            return
+        for name in os.listdir(EVALUATION_JOB_DIR):
+            directory = os.path.join(EVALUATION_JOB_DIR, name)
+            if name in self.jobs or not os.path.exists(os.path.join(directory, "job.json")):
+                continue
+            job = EvaluationJob.load(directory)
+            if job.status != "completed":
+                self._add(job)
+            elif self._expired(job):
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def _expired(self, job: EvaluationJob) -> bool:
+        finished_at = job.finished_at or os.path.getmtime(os.path.join(job.directory, "results"))
+        return time.time() - finished_at > EVALUATION_JOB_TTL
+
+    def _finish(self, job: EvaluationJob):
+        """
+        Takes a completed job out of the dispatch rotation and deletes it once it expires.
+        """
+        job.finished_at = time.time()
+        job.save()
+        if job.job_id in self._turns:
+            self._turns.remove(job.job_id)
+        asyncio.get_running_loop().call_later(EVALUATION_JOB_TTL, self._expire, job.job_id)
+
+    def _expire(self, job_id: str):
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    def _next(self):
+        ready = [self.jobs[job_id] for job_id in self._turns if self.jobs[job_id].pending]
+        if not ready:
+            return None
+        top_priority = max(job.priority for job in ready)
+        for _ in range(len(self._turns)):
+            job = self.jobs[self._turns[0]]
+            self._turns.rotate(-1)
+            if job.pending and job.priority == top_priority:
+                return job, job.pending.popleft()
+
+    async def _dispatch(self):
+        while True:
+            await self._workers.acquire()
+            picked = self._next()
+            while picked is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                picked = self._next()
+
+            delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._limiter.acquire()
+
+            job, index = picked
+            job.in_progress.add(index)
+            asyncio.ensure_future(self._run(job, index))
+
+    async def _run(self, job: EvaluationJob, index: int):
+        submission = job.submissions[index]
+        try:
+            result = await evaluate_exam_paper(ExamEvaluationRequest(**submission["request"]))
+            self._backoff = EVALUATION_BACKOFF_SECONDS
+            job.record(index, {
+                "submissionId": submission["submissionId"],
+                "status": "completed",
+                "evaluationResult": result,
+            })
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self._paused_until = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, EVALUATION_BACKOFF_MAX_SECONDS)
+                job.rate_limited[index] = job.rate_limited.get(index, 0) + 1
+                retry = job.rate_limited[index] < EVALUATION_BATCH_MAX_RATE_LIMITED
+                if retry:
+                    record_retry("batch_evaluation", "rate_limit")
+                    job.pending.appendleft(index)
+            else:
+                job.attempts[index] = job.attempts.get(index, 0) + 1
+                retry = job.attempts[index] < EVALUATION_BATCH_MAX_ATTEMPTS
+                if retry:
+                    record_retry("batch_evaluation", "submission")
+                    job.pending.append(index)
+            if not retry:
+                job.record(index, {
+                    "submissionId": submission["submissionId"],
+                    "status": "failed",
+                    "error": getattr(e, "detail", None) or str(e),
+                })
+        finally:
+            job.in_progress.discard(index)
+            if job.status == "completed" and job.finished_at is None:
+                self._finish(job)
+            self._workers.release()
+            self._wakeup.set()
+
+    async def stream(self, job: EvaluationJob):
+        """
+        Yields each submission result as it is recorded, starting with those already done.
+        """
+        sent = set()
+        while True:
+            changed = job.changed
+            for index in sorted(set(job.results) - sent):
+                sent.add(index)
+                yield job.results[index]
+            if job.status == "completed":
+                return
+            await changed.wait()
+
+
+evaluation_scheduler = EvaluationScheduler()
+
+
+def submit_batch_evaluation(submissions: List, priority: int = 0) -> EvaluationJob:
+    evaluation_scheduler.start()
+    return evaluation_scheduler.submit(jsonable_encoder(submissions), priority)
@@ -40,3 +40,30 @@ def validate_exam_structure(generated_exam: Dict, req: ExamPaperRequest):
     for i, q in enumerate(coding, start=1):
         if q.get("marks") != schema.code.mark:
             raise HTTPException(status_code=422, detail=f"Coding {i} has invalid marks")
+
+
+def repair_section(section: str, questions: List, mark: int) -> List[Dict]:
+    """
+    Fixes what can be fixed without the model in one generated section: drops
+    malformed or duplicate questions and MCQs without four options or a valid
+    correctOption, and sets every question's marks to the schema value.
+    The result may hold fewer or more questions than required; the caller
+    regenerates the missing ones or trims the extra.
+    """
+    repaired = []
+    seen = set()
+    for q in questions if isinstance(questions, list) else []:
+        if not isinstance(q, dict) or not str(q.get("text", "")).strip():
+            continue
+        key = " ".join(str(q["text"]).lower().split())
+        if key in seen:
+            continue
+        if section == "mcq_questions":
+            option = str(q.get("correctOption", "")).strip().upper()
+            if option not in ["A", "B", "C", "D"] or len(q.get("options") or []) != 4:
+                continue
+            q["correctOption"] = option
+        q["marks"] = mark
+        seen.add(key)
+        repaired.append(q)
+    return repaired
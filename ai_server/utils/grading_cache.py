@@ -0,0 +1,68 @@
+import os
+import re
+import string
+from dotenv import load_dotenv
+from schemas.exam_evaluation import QuestionSchema
+from utils.context_cache import TTLCache, make_cache_key
+from utils.metrics import register_cache
+
+load_dotenv()
+
+GRADING_CACHE_SIZE = int(os.getenv("GRADING_CACHE_SIZE", "10000"))
+GRADING_CACHE_TTL = float(os.getenv("GRADING_CACHE_TTL", "86400"))
+
+grading_cache = TTLCache(GRADING_CACHE_SIZE, GRADING_CACHE_TTL)
+register_cache("grading", grading_cache.stats)
+blank_answers = 0
+
+# Punctuation at a word boundary ("end.", "(a)"), but not inside a word or number ("2.5", "don't").
+_edge_punctuation = re.compile(
+    rf"(?<![^\W_])[{re.escape(string.punctuation)}]+|[{re.escape(string.punctuation)}]+(?![^\W_])"
+)
+
+
+def is_blank_answer(text: str) -> bool:
+    """
+    An answer with no letters or digits at all ("", "  ", "-", "...") can only score 0.
+    """
+    return not any(ch.isalnum() for ch in text or "")
+
+
+def normalize_answer(text: str, question_type: str) -> str:
+    """
+    Normalizes an answer for fingerprinting. Code keeps its case, punctuation
+    and line structure; only trailing whitespace on each line and leading or
+    trailing blank lines are dropped. Subjective answers ignore case, spacing
+    and punctuation at word boundaries.
+    """
+    text = text or ""
+    if question_type == "code":
+        return "\n".join(line.rstrip() for line in text.splitlines()).strip("\n")
+    text = _edge_punctuation.sub(" ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def grading_key(question_type: str, question: QuestionSchema, instructions: str) -> str:
+    return make_cache_key(
+        "grading-v2",
+        question_type,
+        question.question.strip(),
+        question.marks,
+        (instructions or "").strip(),
+        normalize_answer(question.answerText, question_type),
+    )
+
+
+def blank_result(question: QuestionSchema) -> dict:
+    global blank_answers
+    blank_answers += 1
+    return {
+        "questionId": question.questionId,
+        "marksAwarded": 0,
+        "answerText": question.answerText,
+        "aiFeedback": "No answer was provided.",
+    }
+
+
+def grading_stats() -> dict:
+    return {**grading_cache.stats(), "blankAnswers": blank_answers}
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import uuid
+import threading
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from utils.pdf_vectorizer import ingest_pdf
+from llms.important_topic_generator import TopicExtractor
+
+load_dotenv()
+
+INGESTION_JOB_DIR = os.getenv("INGESTION_JOB_DIR", "exgenai_ingestion_jobs")
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "1"))
+
+_executor = ThreadPoolExecutor(max_workers=INGESTION_WORKERS, thread_name_prefix="ingestion")
+_lock = threading.Lock()
+
+PENDING_STATUSES = ("queued", "running")
+
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(INGESTION_JOB_DIR, f"{job_id}.json")
+
+
+def _save_job(job: Dict):
+    job["updatedAt"] = time.time()
+    os.makedirs(INGESTION_JOB_DIR, exist_ok=True)
+    tmp_path = _job_path(job["jobId"]) + ".tmp"
+    with _lock:
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, _job_path(job["jobId"]))
+
+
+def _load_job(job_id: str) -> Optional[Dict]:
+    path = _job_path(job_id)
+    if not os.path.exists(path):
+        return None
+    with _lock:
+        with open(path) as f:
+            return json.load(f)
+
+
+def _public_view(job: Dict) -> Dict:
+    return {key: value for key, value in job.items() if key != "topicState"}
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    job = _load_job(job_id)
+    return _public_view(job) if job else None
+
+
+def list_jobs() -> List[Dict]:
+    if not os.path.isdir(INGESTION_JOB_DIR):
+        return []
+    jobs = []
+    for name in sorted(os.listdir(INGESTION_JOB_DIR)):
+        if name.endswith(".json"):
+            job = _load_job(name[:-len(".json")])
+            if job:
+                jobs.append(_public_view(job))
+    return sorted(jobs, key=lambda job: job["createdAt"])
+
+
+def create_ingestion_job(pdf_path: str, metadata: Dict) -> Dict:
+    """
+    Persists a new ingestion job and queues it on the ingestion worker.
+    """
+    now = time.time()
+    job = {
+        "jobId": uuid.uuid4().hex,
+        "pdfPath": pdf_path,
+        "metadata": metadata,
+        "status": "queued",
+        "pagesTotal": None,
+        "pagesProcessed": 0,
+        "lastCommittedPage": -1,
+        "chunksEmbedded": 0,
+        "chunksSkipped": 0,
+        "chunksRemoved": 0,
+        "batchesCommitted": 0,
+        "topicState": None,
+        "importantTopics": None,
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+    _save_job(job)
+    _executor.submit(_run_job, job["jobId"])
+    return _public_view(job)
+
+
+def resume_pending_jobs() -> int:
+    """
+    Re-queues jobs that were queued or running when the process stopped.
+    They continue after their last checkpoint.
+    """
+    pending = [job for job in list_jobs() if job["status"] in PENDING_STATUSES]
+    for job in pending:
+        _executor.submit(_run_job, job["jobId"])
+    return len(pending)
+
+
+def retry_ingestion_job(job_id: str) -> Optional[Dict]:
+    """
+    Re-queues a failed job; it continues after its last checkpoint.
+    """
+    job = _load_job(job_id)
+    if job is None:
+        return None
+    if job["status"] == "failed":
+        job["status"] = "queued"
+        _save_job(job)
+        _executor.submit(_run_job, job_id)
+    return _public_view(job)
+
+
+def _run_job(job_id: str):
+    job = _load_job(job_id)
+    if job is None:
+        return
+
+    job["status"] = "running"
+    job["error"] = None
+    _save_job(job)
+
+    def on_open(pages_total: int):
+        job["pagesTotal"] = pages_total
+        _save_job(job)
+
+    extractor = TopicExtractor(job["topicState"])
+
+    def on_batch(last_page: int, embedded: int, skipped: int):
+        job["lastCommittedPage"] = last_page
+        job["pagesProcessed"] = last_page + 1
+        job["chunksEmbedded"] += embedded
+        job["chunksSkipped"] += skipped
+        job["batchesCommitted"] += 1
+        job["topicState"] = extractor.state()
+        _save_job(job)
+
+    try:
+        counts = ingest_pdf(
+            job["pdfPath"],
+            job["metadata"],
+            run_id=job["jobId"],
+            start_page=job["lastCommittedPage"] + 1,
+            on_open=on_open,
+            on_chunk=extractor.add_chunk,
+            on_batch=on_batch,
+        )
+        job["chunksRemoved"] = counts["removed"]
+        # Trailing pages without text commit no batch, so they are only counted here.
+        job["pagesProcessed"] = job["pagesTotal"] or job["pagesProcessed"]
+        result = extractor.finish()
+        job["importantTopics"] = result if result else "No important topics found."
+        job["status"] = "completed"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+    _save_job(job)
@@ -0,0 +1,79 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+
+class JsonArrayItemStream:
+    """
+    Incremental parser for model output shaped like {"key": [{...}, {...}], ...}.
+
+    `feed` takes the next piece of streamed text and returns the array items
+    that were completed by it, as (key, item) pairs, so callers can act on each
+    question as soon as its closing brace arrives. Text before the first "{"
+    (e.g. a ```json fence) is ignored, and items that are not valid JSON objects
+    are skipped.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[Tuple[Optional[str], Dict]]:
+        self._buffer += text
+        items = []
+        while self._position < len(self._buffer):
+            ch = self._buffer[self._position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = self._buffer[self._string_start:self._position]
+            elif ch == '"' and self._stack:
+                self._in_string = True
+                self._string_start = self._position + 1
+            elif ch == ":" and len(self._stack) == 1:
+                self._key = self._last_string
+            elif ch in "{[":
+                if ch == "{" and self._stack == ["{", "["]:
+                    self._item_start = self._position
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._stack == ["{", "["] and self._item_start is not None:
+                    item = self._parse(self._buffer[self._item_start:self._position + 1])
+                    if item is not None:
+                        items.append((self._key, item))
+                    self._item_start = None
+            self._position += 1
+        self._compact()
+        return items
+
+    def _parse(self, text: str) -> Optional[Dict]:
+        try:
+            item = json.loads(text)
+        except ValueError:
+            return None
+        return item if isinstance(item, dict) else None
+
+    def _compact(self):
+        # Keep only the text an open item or string still needs.
+        keep_from = min(
+            start for start in (self._item_start, self._string_start if self._in_string else None, self._position)
+            if start is not None
+        )
+        if keep_from > 0:
+            self._buffer = self._buffer[keep_from:]
+            self._position -= keep_from
+            self._string_start -= keep_from
+            if self._item_start is not None:
+                self._item_start -= keep_from
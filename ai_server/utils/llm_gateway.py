@@ -0,0 +1,265 @@
+"""
+Single entry point for LLM provider calls.
+
+Every chain call goes through `ainvoke_limited`, which per provider:
+
+- coalesces identical in-flight calls (same chain and inputs) into one;
+- waits for the provider's RPM and TPM token buckets;
+- bounds concurrency with a limit that halves when the provider answers 429
+  and grows back by one slot per window of successful calls (AIMD);
+- retries 429s with jittered exponential backoff, honouring Retry-After.
+
+When the retries run out it raises ProviderRateLimitError, which controllers
+turn into a 503 with a Retry-After header instead of a generic 500.
+
+Synchronous code (topic extraction on ingestion threads) goes through the same
+gateways with `submit_limited`/`invoke_limited`, which run the call on the
+gateway's event loop: the app's loop once `bind_gateway_loop` is called at
+startup, otherwise a background loop started on first use.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from utils.concurrency import PROVIDER_LIMITS, RateLimiter, is_rate_limit_error
+from utils.context_cache import TTLCache, make_cache_key
+from utils.context_builder import estimate_tokens
+from utils.metrics import record_retry
+
+load_dotenv()
+
+# 0 disables the bucket; set these to the limits of your provider plan.
+PROVIDER_RATE_LIMITS = {
+    "groq": {"rpm": float(os.getenv("GROQ_RPM", "0")), "tpm": float(os.getenv("GROQ_TPM", "0"))},
+    "huggingface": {"rpm": float(os.getenv("HUGGINGFACE_RPM", "0")), "tpm": float(os.getenv("HUGGINGFACE_TPM", "0"))},
+}
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "500"))
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "4"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "1000"))
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "600"))
+
+
+class ProviderRateLimitError(Exception):
+    """
+    The provider kept answering 429 after all retries.
+    """
+    status_code = 429
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} rate limit reached, retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderGateway:
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.max_concurrency = PROVIDER_LIMITS.get(provider, 8)
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self.coalesced = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        limits = PROVIDER_RATE_LIMITS.get(provider, {})
+        self._rpm = RateLimiter(limits["rpm"]) if limits.get("rpm") else None
+        self._tpm = RateLimiter(limits["tpm"]) if limits.get("tpm") else None
+
+    async def _acquire_slot(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def _release_slot(self, throttled: bool):
+        async with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                # Many calls fail together on one 429 burst; shrink once per burst.
+                if now - self._last_decrease > 1:
+                    self.limit = max(LLM_MIN_CONCURRENCY, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    async def _wait_for_budget(self, inputs):
+        if self._rpm:
+            await self._rpm.acquire()
+        if self._tpm:
+            tokens = estimate_tokens(str(inputs)) + LLM_EXPECTED_COMPLETION_TOKENS
+            await self._tpm.acquire(min(tokens, self._tpm.capacity))
+
+    async def _call(self, chain, inputs):
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            await self._wait_for_budget(inputs)
+            await self._acquire_slot()
+            throttled = False
+            try:
+                return await chain.ainvoke(inputs)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                throttled = True
+                self.throttled += 1
+                delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_SECONDS * 2 ** attempt))
+                delay = max(delay, _retry_after(e) or 0)
+                if attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise ProviderRateLimitError(self.provider, delay) from e
+            finally:
+                await self._release_slot(throttled)
+            record_retry("gateway", self.provider)
+            await asyncio.sleep(delay)
+
+    async def astream(self, model, prompt):
+        """
+        Streams a model's reply under the same budget, concurrency limit and
+        backoff as `ainvoke`. A 429 is only retried before the first chunk;
+        streams are never coalesced.
+        """
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            await self._wait_for_budget(prompt)
+            await self._acquire_slot()
+            throttled = False
+            streamed = False
+            try:
+                async for chunk in model.astream(prompt):
+                    streamed = True
+                    yield chunk
+                return
+            except Exception as e:
+                if streamed or not is_rate_limit_error(e):
+                    raise
+                throttled = True
+                self.throttled += 1
+                delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_SECONDS * 2 ** attempt))
+                delay = max(delay, _retry_after(e) or 0)
+                if attempt == LLM_RATE_LIMIT_RETRIES:
+                    raise ProviderRateLimitError(self.provider, delay) from e
+            finally:
+                await self._release_slot(throttled)
+            record_retry("gateway", self.provider)
+            await asyncio.sleep(delay)
+
+    async def ainvoke(self, chain, inputs):
+        key = make_cache_key(self.provider, id(chain), inputs)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call(chain, inputs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        return {
+            "concurrencyLimit": int(self.limit),
+            "maxConcurrency": self.max_concurrency,
+            "inFlight": self.in_flight,
+            "throttled": self.throttled,
+            "coalesced": self.coalesced,
+        }
+
+
+_gateways: Dict[str, ProviderGateway] = {}
+
+
+def get_gateway(provider: str) -> ProviderGateway:
+    if provider not in _gateways:
+        _gateways[provider] = ProviderGateway(provider)
+    return _gateways[provider]
+
+
+async def ainvoke_limited(provider: str, chain, inputs):
+    """
+    Calls `chain.ainvoke(inputs)` through the provider's gateway.
+    """
+    return await get_gateway(provider).ainvoke(chain, inputs)
+
+
+async def astream_limited(provider: str, model, prompt):
+    """
+    Streams `model`'s reply to `prompt` through the provider's gateway.
+    """
+    async for chunk in get_gateway(provider).astream(model, prompt):
+        yield chunk
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def bind_gateway_loop(loop: asyncio.AbstractEventLoop):
+    """
+    Runs synchronous callers' calls on `loop` (the app's event loop), so they
+    share the concurrency limit and rate buckets with async callers.
+    """
+    global _loop
+    with _loop_lock:
+        _loop = loop
+
+
+def _gateway_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-gateway", daemon=True).start()
+        return _loop
+
+
+def submit_limited(provider: str, chain, inputs) -> Future:
+    """
+    Schedules `chain.ainvoke(inputs)` through the provider's gateway from a
+    worker thread and returns a concurrent Future for the result.
+    """
+    return asyncio.run_coroutine_threadsafe(ainvoke_limited(provider, chain, inputs), _gateway_loop())
+
+
+def invoke_limited(provider: str, chain, inputs):
+    """
+    Blocking `ainvoke_limited` for worker threads (never call it on the event loop).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return submit_limited(provider, chain, inputs).result()
+    raise RuntimeError("invoke_limited would block the event loop; await ainvoke_limited instead")
+
+
+def gateway_stats() -> Dict:
+    return {provider: gateway.stats() for provider, gateway in _gateways.items()}
+
+
+idempotent_responses = TTLCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL)
+
+
+async def run_idempotent(kind: str, idempotency_key: Optional[str], payload, compute):
+    """
+    Runs `compute()` once per idempotency key and payload: a retried request
+    joins the original while it is still running and gets its result afterwards
+    (for IDEMPOTENCY_TTL seconds). Reusing a key with a different payload runs
+    again, and requests without a key always run.
+    """
+    if not idempotency_key:
+        return await compute()
+    key = make_cache_key(kind, idempotency_key, payload)
+    return await idempotent_responses.get_or_compute(key, compute)
@@ -0,0 +1,202 @@
+"""
+Per-stage latency, LLM token, retry and cache metrics, exported in Prometheus
+format on /metrics.
+
+Code wraps each pipeline stage in `span(component, stage)`. Every span is
+observed in the `exgenai_stage_seconds` histogram and, when the current HTTP
+request is being timed, added to that request's breakdown, which the timing
+middleware returns as a `Server-Timing` header.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+from dotenv import load_dotenv
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from langchain_core.runnables import RunnableLambda
+from utils.context_builder import estimate_tokens
+
+load_dotenv()
+
+TIMING_HEADER = os.getenv("TIMING_HEADER", "false").lower() == "true"
+
+STAGE_SECONDS = Histogram(
+    "exgenai_stage_seconds",
+    "Time spent in each pipeline stage.",
+    ["component", "stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_TOKENS = Histogram(
+    "exgenai_llm_tokens",
+    "Prompt and completion tokens per LLM call.",
+    ["component", "kind"],
+    buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+RETRIES = Counter("exgenai_retries_total", "Retried LLM calls and repair rounds.", ["component", "stage"])
+CONTEXT_TOKENS_SAVED = Histogram(
+    "exgenai_context_tokens_saved",
+    "Retrieved tokens cut by the context builder per context build.",
+    ["component"],
+    buckets=(0, 64, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+CONTEXT_CHUNKS_DROPPED = Histogram(
+    "exgenai_context_chunks_dropped",
+    "Retrieved chunks dropped (duplicates, redundant or over budget) per context build.",
+    ["component"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+_timings_lock = threading.Lock()
+_caches: Dict[str, Callable[[], Dict]] = {}
+
+
+@contextmanager
+def span(component: str, stage: str):
+    """
+    Times the enclosed block as `stage` of `component` (e.g. "generator", "llm_call").
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(component, stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            with _timings_lock:
+                name = f"{component}.{stage}"
+                timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def timed_iter(iterable, component: str, stage: str):
+    """
+    Yields from `iterable`, timing each step as `stage` (e.g. lazily loading PDF pages).
+    """
+    iterator = iter(iterable)
+    while True:
+        with span(component, stage):
+            item = next(iterator, _done)
+        if item is _done:
+            return
+        yield item
+
+
+_done = object()
+
+
+def record_retry(component: str, stage: str):
+    RETRIES.labels(component, stage).inc()
+
+
+def _token_usage(prompt, message):
+    """
+    Returns (prompt, completion) tokens as reported by the provider, or estimated
+    from the text when the client doesn't report usage (fake and replay backends).
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    prompt_text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+    return estimate_tokens(prompt_text), estimate_tokens(str(getattr(message, "content", message)))
+
+
+def record_llm_tokens(component: str, prompt, message):
+    """
+    Records the token counts of one LLM call; `message` may be the reply message or its text.
+    """
+    prompt_tokens, completion_tokens = _token_usage(prompt, message)
+    LLM_TOKENS.labels(component, "prompt").observe(prompt_tokens)
+    LLM_TOKENS.labels(component, "completion").observe(completion_tokens)
+
+
+def record_context_stats(component: str, stats: Dict):
+    """
+    Records the stats returned by `build_context` for one context build.
+    """
+    CONTEXT_TOKENS_SAVED.labels(component).observe(stats["tokensSaved"])
+    CONTEXT_CHUNKS_DROPPED.labels(component).observe(stats["chunksDropped"])
+
+
+def instrument_llm(model, component: str):
+    """
+    Wraps a chat model so every call is timed as `component`'s "llm_call" stage
+    and its prompt/completion token counts are recorded.
+    """
+    def observe(prompt, message):
+        record_llm_tokens(component, prompt, message)
+        return message
+
+    def invoke(prompt):
+        with span(component, "llm_call"):
+            message = model.invoke(prompt)
+        return observe(prompt, message)
+
+    async def ainvoke(prompt):
+        with span(component, "llm_call"):
+            message = await model.ainvoke(prompt)
+        return observe(prompt, message)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"{component}-llm")
+
+
+def instrument(runnable, component: str, stage: str):
+    """
+    Wraps a chain step (prompt template, output parser) so it is timed as `stage`.
+    """
+    def invoke(inputs):
+        with span(component, stage):
+            return runnable.invoke(inputs)
+
+    async def ainvoke(inputs):
+        with span(component, stage):
+            return await runnable.ainvoke(inputs)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"{component}-{stage}")
+
+
+def register_cache(name: str, stats: Callable[[], Dict]):
+    """
+    Exports a cache's hit/miss counters. `stats` returns at least {"hits", "misses"}.
+    """
+    _caches[name] = stats
+
+
+class _CacheCollector:
+    def collect(self):
+        hits = CounterMetricFamily("exgenai_cache_hits", "Cache hits.", labels=["cache"])
+        misses = CounterMetricFamily("exgenai_cache_misses", "Cache misses.", labels=["cache"])
+        ratio = GaugeMetricFamily("exgenai_cache_hit_ratio", "Cache hit rate since start.", labels=["cache"])
+        for name, stats in _caches.items():
+            values = stats()
+            total = values["hits"] + values["misses"]
+            hits.add_metric([name], values["hits"])
+            misses.add_metric([name], values["misses"])
+            ratio.add_metric([name], values["hits"] / total if total else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+
+REGISTRY.register(_CacheCollector())
+
+
+def start_request_timing() -> Dict[str, float]:
+    """
+    Starts collecting span timings for the current request and returns the (live) breakdown.
+    """
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def format_server_timing(timings: Dict[str, float], total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(timings.items())]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
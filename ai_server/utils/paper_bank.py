@@ -0,0 +1,145 @@
+import os
+import time
+import asyncio
+from collections import deque
+from dotenv import load_dotenv
+from schemas.exam_request_schema import ExamPaperRequest
+from utils.question_index import get_exam_key
+from llms.paper_generator import generate_reserved_exam_paper, commit_exam_questions, release_exam_questions
+
+load_dotenv()
+
+PAPER_BANK_CONCURRENCY = int(os.getenv("PAPER_BANK_CONCURRENCY", "4"))
+PAPER_BANK_MAX_ATTEMPTS = int(os.getenv("PAPER_BANK_MAX_ATTEMPTS", "3"))
+
+
+class ExamPool:
+    def __init__(self, req: ExamPaperRequest, target: int):
+        self.req = req
+        self.target = target
+        self.papers = deque()
+        self.in_progress = 0
+        self.generated = 0
+        self.failed = 0
+        self.served = 0
+        self.misses = 0
+        self.created_at = time.monotonic()
+        self.last_error = None
+        self.task = None
+
+    def stats(self) -> dict:
+        elapsed_minutes = (time.monotonic() - self.created_at) / 60
+        return {
+            "subject": self.req.subject,
+            "depth": len(self.papers),
+            "target": self.target,
+            "inProgress": self.in_progress,
+            "generated": self.generated,
+            "failed": self.failed,
+            "served": self.served,
+            "misses": self.misses,
+            "fillRatePerMinute": self.generated / elapsed_minutes if elapsed_minutes else 0.0,
+            "lastError": self.last_error,
+        }
+
+
+class PaperBank:
+    """
+    Keeps a pool of pre-generated, validated exam papers per exam.
+
+    Pools are filled by background tasks with at most PAPER_BANK_CONCURRENCY
+    generations running at once across all exams, and are topped up again
+    every time a paper is handed out. A pooled paper's questions are only
+    reserved in the exam's question index; they are recorded when the paper is
+    handed out and released if the exam is unregistered.
+    """
+
+    def __init__(self):
+        self.pools = {}
+        self._semaphore = None
+
+    def register(self, req: ExamPaperRequest, size: int) -> str:
+        exam_key = get_exam_key(req)
+        pool = self.pools.get(exam_key)
+        if pool is None:
+            pool = ExamPool(req, size)
+            self.pools[exam_key] = pool
+        else:
+            pool.target = size
+        self._schedule_fill(pool)
+        return exam_key
+
+    def unregister(self, exam_key: str) -> bool:
+        pool = self.pools.pop(exam_key, None)
+        if pool is None:
+            return False
+        if pool.task and not pool.task.done():
+            pool.task.cancel()
+        for _, reservation in pool.papers:
+            release_exam_questions(pool.req, reservation)
+        pool.papers.clear()
+        return True
+
+    def take(self, req: ExamPaperRequest):
+        """
+        Pops a ready paper for the exam, or returns None if the exam is not
+        registered or its pool is empty. Always schedules a refill.
+        """
+        pool = self.pools.get(get_exam_key(req))
+        if pool is None:
+            return None
+
+        paper = None
+        if pool.papers:
+            paper, reservation = pool.papers.popleft()
+            commit_exam_questions(pool.req, paper, reservation)
+            pool.served += 1
+        else:
+            pool.misses += 1
+        self._schedule_fill(pool)
+        return paper
+
+    def stats(self, exam_key: str = None) -> dict:
+        if exam_key is not None:
+            pool = self.pools.get(exam_key)
+            return pool.stats() if pool else None
+        return {key: pool.stats() for key, pool in self.pools.items()}
+
+    def _schedule_fill(self, pool: ExamPool):
+        if pool.task is None or pool.task.done():
+            pool.task = asyncio.ensure_future(self._fill(pool))
+
+    async def _fill(self, pool: ExamPool):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(PAPER_BANK_CONCURRENCY)
+
+        # Papers taken while a round is running are refilled by the next round;
+        # stop once a whole round fails so a broken exam doesn't spin forever.
+        while len(pool.papers) + pool.in_progress < pool.target:
+            workers = []
+            while len(pool.papers) + pool.in_progress < pool.target:
+                pool.in_progress += 1
+                workers.append(asyncio.ensure_future(self._generate_one(pool)))
+            results = await asyncio.gather(*workers)
+            if not any(results):
+                break
+
+    async def _generate_one(self, pool: ExamPool):
+        try:
+            async with self._semaphore:
+                for attempt in range(PAPER_BANK_MAX_ATTEMPTS):
+                    try:
+                        paper, reservation = await generate_reserved_exam_paper(pool.req)
+                    except Exception as e:
+                        pool.failed += 1
+                        pool.last_error = getattr(e, "detail", None) or str(e)
+                        continue
+                    pool.papers.append((paper, reservation))
+                    pool.generated += 1
+                    return True
+                return False
+        finally:
+            pool.in_progress -= 1
+
+
+paper_bank = PaperBank()
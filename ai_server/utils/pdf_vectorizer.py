@@ -1,41 +1,444 @@
 from dotenv import load_dotenv
-from typing import List, Dict
+import os
+import uuid
+import hashlib
+import time
+import threading
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Callable, Tuple, Iterator
+from pypdf import PdfReader
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from llms.important_topic_generator import find_important_topics
+from llms.important_topic_generator import TopicExtractor
+from utils.context_cache import retrieval_context_cache
+from utils.services import register_service, get_service, register_warmup, is_loaded
+from utils.metrics import span, timed_iter
 
 load_dotenv()
 
-CHROMA_DIR = "exgenai_vector_store"
+CHROMA_DIR = os.getenv("CHROMA_DIR", "exgenai_vector_store")
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+# Seconds between persists (and resumable checkpoints) while one PDF is ingested.
+INGEST_CHECKPOINT_SECONDS = float(os.getenv("INGEST_CHECKPOINT_SECONDS", "30"))
+# Bulk ingestion: processes parsing PDFs, chunks per embedding call, chunks per vector store write.
+INGEST_PROCESS_WORKERS = int(os.getenv("INGEST_PROCESS_WORKERS", str(os.cpu_count() or 2)))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+INGEST_WRITE_BATCH_SIZE = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "5000"))
+# chroma: the persistent Chroma store. numpy: the in-process index in utils/vector_index.py.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "exgenai_vector_index")
+# numpy backend only: storage precision (float32, float16, int8) and the rescoring shortlist factor (0 = off).
+VECTOR_PRECISION = os.getenv("VECTOR_PRECISION") or None
+VECTOR_RESCORE = int(os.getenv("VECTOR_RESCORE", "0"))
 
-_embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-_vectorstore = Chroma(persist_directory=CHROMA_DIR, embedding_function=_embeddings)
+def _create_embeddings():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
 
-def add_pdf_to_vectorstore(pdf_path: str, metadata: Dict) -> str:
-    print(metadata, pdf_path)
+def _create_vectorstore():
+    from langchain_community.vectorstores import Chroma
+    return Chroma(persist_directory=CHROMA_DIR, embedding_function=get_service("embeddings"))
+
+def _warm_up_embeddings():
+    get_service("embeddings").embed_documents(["warm up"])
+
+def _create_collection():
+    if VECTOR_BACKEND == "numpy":
+        from utils.vector_index import NumpyVectorIndex
+        return NumpyVectorIndex(os.path.join(VECTOR_INDEX_DIR, "langchain"), precision=VECTOR_PRECISION, rescore=VECTOR_RESCORE)
+    return get_service("vectorstore")._collection
+
+def _create_parse_pool():
+    # spawn, not fork: the pool starts after torch and the worker threads, and forking those can deadlock.
+    return ProcessPoolExecutor(max_workers=INGEST_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+def shutdown_parse_pool():
+    if is_loaded("parse_pool"):
+        get_service("parse_pool").shutdown(wait=False, cancel_futures=True)
+
+def _warm_up_collection():
+    get_service("collection").count()
+
+register_service("embeddings", _create_embeddings)
+register_service("vectorstore", _create_vectorstore)
+register_service("collection", _create_collection)
+register_service("parse_pool", _create_parse_pool)
+register_warmup("embeddings", _warm_up_embeddings)
+register_warmup("collection", _warm_up_collection)
+
+def _get_embeddings():
+    return get_service("embeddings")
+
+def _get_vectorstore():
+    return get_service("vectorstore")
+
+def _get_collection():
+    return get_service("collection")
+
+def _persist():
+    if VECTOR_BACKEND == "numpy":
+        _get_collection().persist()
+    else:
+        _get_vectorstore().persist()
+
+_store_version = 0
+_source_locks = defaultdict(threading.Lock)
+
+def get_vectorstore_version() -> int:
+    return _store_version
+
+def _mark_collection_changed():
+    """
+    Bumps the vector store version and drops retrieval contexts built from the old contents.
+    """
+    global _store_version
+    _store_version += 1
+    retrieval_context_cache.clear()
+
+def build_scope_filter(pdf_ids: Optional[List[str]]) -> Optional[Dict]:
+    """
+    Builds a Chroma `where` filter that limits a search to the chunks of the given syllabus PDFs.
+    Returns None (search everything) when no ids are given.
+    """
+    pdf_ids = [pdf_id for pdf_id in (pdf_ids or []) if pdf_id]
+    if not pdf_ids:
+        return None
+    if len(pdf_ids) == 1:
+        return {"pdf_id": pdf_ids[0]}
+    return {"pdf_id": {"$in": sorted(set(pdf_ids))}}
+
+def _normalize_metadata(metadata: Dict) -> Dict:
+    metadata = dict(metadata)
+    if not metadata.get("pdf_id") and metadata.get("publicId"):
+        metadata["pdf_id"] = metadata["publicId"]
+    return metadata
+
+def make_chunk_id(source_id: str, text: str) -> str:
+    """
+    Deterministic chunk id: the same text from the same source always maps to the same id.
+    """
+    return hashlib.sha256(f"{source_id}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+def _commit_batch(docs: List[Document], ids: List[str]) -> Tuple[int, int]:
+    """
+    Embeds only the chunks that are not in the store yet. Chunks that already
+    exist just get their metadata refreshed (which also stamps the current run).
+
+    Returns:
+        Tuple[int, int]: (embedded, skipped) chunk counts.
+    """
+    unique = dict(zip(ids, docs))
+    with span("vectorizer", "chroma_lookup"):
+        existing = set(_get_collection().get(ids=list(unique), include=[])["ids"])
+    new_ids = [chunk_id for chunk_id in unique if chunk_id not in existing]
+
+    with span("vectorizer", "chroma_write"):
+        if existing:
+            existing = list(existing)
+            _get_collection().update(ids=existing, metadatas=[unique[chunk_id].metadata for chunk_id in existing])
+    if new_ids:
+        texts = [unique[chunk_id].page_content for chunk_id in new_ids]
+        with span("vectorizer", "embedding"):
+            embeddings = _get_embeddings().embed_documents(texts)
+        with span("vectorizer", "chroma_write"):
+            _get_collection().upsert(
+                ids=new_ids,
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=[unique[chunk_id].metadata for chunk_id in new_ids],
+            )
+        _mark_collection_changed()
+    return len(new_ids), len(existing)
+
+_legacy_checked = set()
+
+def _legacy_chunk_ids(source_id: str) -> List[str]:
+    """
+    Ids of chunks of `source_id` stored before chunk ids were content hashes:
+    they have random ids and no `source_id`, so a re-upload would not replace
+    them. Looked up once per source and process; afterwards none are left.
+    """
+    if source_id in _legacy_checked:
+        return []
+    _legacy_checked.add(source_id)
+    results = _get_collection().get(
+        where={"$or": [{"pdf_id": source_id}, {"publicId": source_id}, {"source": source_id}]},
+        include=["metadatas"],
+    )
+    return [chunk_id for chunk_id, meta in zip(results["ids"], results["metadatas"]) if "source_id" not in (meta or {})]
+
+def _remove_stale_chunks(source_id: str, run_id: str, persist: bool = True) -> int:
+    """
+    Deletes chunks of `source_id` that were not produced or confirmed by `run_id`,
+    i.e. sections that were removed or changed in the re-uploaded PDF, along
+    with any legacy chunks of the source.
+    """
+    stale = _get_collection().get(
+        where={"$and": [{"source_id": source_id}, {"ingest_run": {"$ne": run_id}}]},
+        include=[],
+    )["ids"]
+    stale += _legacy_chunk_ids(source_id)
+    if stale:
+        _get_collection().delete(ids=stale)
+        if persist:
+            _persist()
+        _mark_collection_changed()
+    return len(stale)
+
+def _load_pages(pdf_path: str, start_page: int = 0) -> Tuple[int, Iterator[Document]]:
+    """
+    Opens a PDF (PyPDFLoader downloads URLs) and returns its page count and the
+    pages from `start_page` on, extracted one at a time. Earlier pages are
+    skipped without extracting their text, so a resumed ingestion doesn't parse
+    again what it already committed.
+    """
     loader = PyPDFLoader(pdf_path)
-    docs = loader.load()
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_documents(docs)
+    reader = PdfReader(loader.file_path)
+    total = len(reader.pages)
 
-    for doc in chunks:
-        doc.metadata.update(metadata)
+    def pages():
+        for number in range(start_page, total):
+            yield Document(
+                page_content=reader.pages[number].extract_text(),
+                metadata={"source": pdf_path, "page": number, "total_pages": total},
+            )
 
-    
-    full_text = "\n\n".join([chunk.page_content for chunk in chunks])
+    return total, pages()
 
-    result = find_important_topics(str(full_text))
-    
-    ids = _vectorstore.add_documents(documents=chunks)
-    _vectorstore.persist()
+def ingest_pdf(
+    pdf_path: str,
+    metadata: Dict,
+    run_id: str,
+    start_page: int = 0,
+    on_open: Optional[Callable[[int], None]] = None,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    on_batch: Optional[Callable[[int, int, int], None]] = None,
+) -> Dict:
+    """
+    Streams a PDF into the vector store page by page.
+
+    Pages are loaded lazily and split one at a time; chunks are embedded and
+    written in batches of about INGEST_BATCH_SIZE, always ending on a page
+    boundary. The store is persisted at a checkpoint every INGEST_CHECKPOINT_SECONDS
+    and at the end (not after every batch, which would rewrite the NumPy index
+    each time), so a crashed ingestion can resume after its last checkpoint.
+
+    Ingestion is idempotent: chunk ids are a hash of the source (`pdf_id`, or the
+    path when there is none) and the chunk text, and chunks that are already
+    stored are not embedded again. Every chunk written or confirmed is stamped
+    with `run_id`; once the whole PDF has been read, chunks of the same source
+    from other runs are deleted, so re-uploading an updated PDF under the same
+    `pdf_id` only embeds new or changed chunks and removes stale ones. Runs for
+    the same source are serialized so a retry cannot delete a concurrent run's chunks.
+
+    Args:
+        pdf_path (str): Local path or URL of the PDF.
+        metadata (Dict): Metadata attached to every chunk.
+        run_id (str): Id of this ingestion run; keep it when resuming.
+        start_page (int): First page to process (0-based).
+        on_open (Callable): Called with the total page count once the PDF is opened.
+        on_chunk (Callable): Called with the text of every chunk, e.g. to feed topic extraction.
+        on_batch (Callable): Called after each checkpoint with the last persisted
+            page and the number of chunks embedded and skipped since the previous one.
+
+    Returns:
+        Dict: Chunk counts for this call (embedded, skipped, removed).
+    """
+    metadata = _normalize_metadata(metadata)
+    source_id = metadata.get("pdf_id") or pdf_path
+    metadata.update({"source_id": source_id, "ingest_run": run_id})
+    with _source_locks[source_id]:
+        total_pages, pages = _load_pages(pdf_path, start_page)
+        if on_open:
+            on_open(total_pages)
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        batch_docs, batch_ids = [], []
+        page_number = start_page - 1
+        counts = {"embedded": 0, "skipped": 0, "removed": 0}
+        reported = dict(counts)
+        checkpointed_at = time.monotonic()
+
+        def checkpoint(last_page: int):
+            nonlocal reported, checkpointed_at
+            with span("vectorizer", "persist"):
+                _persist()
+            if on_batch and counts != reported:
+                on_batch(last_page, counts["embedded"] - reported["embedded"], counts["skipped"] - reported["skipped"])
+            reported = dict(counts)
+            checkpointed_at = time.monotonic()
+
+        for page_number, page in enumerate(timed_iter(pages, "vectorizer", "parse"), start=start_page):
+            with span("vectorizer", "split"):
+                chunks = splitter.split_documents([page])
+            for chunk in chunks:
+                chunk.metadata.update(metadata)
+                batch_docs.append(chunk)
+                batch_ids.append(make_chunk_id(source_id, chunk.page_content))
+                if on_chunk:
+                    on_chunk(chunk.page_content)
+
+            if len(batch_docs) >= INGEST_BATCH_SIZE:
+                embedded, skipped = _commit_batch(batch_docs, batch_ids)
+                counts["embedded"] += embedded
+                counts["skipped"] += skipped
+                batch_docs, batch_ids = [], []
+                if time.monotonic() - checkpointed_at >= INGEST_CHECKPOINT_SECONDS:
+                    checkpoint(page_number)
+
+        if batch_docs:
+            embedded, skipped = _commit_batch(batch_docs, batch_ids)
+            counts["embedded"] += embedded
+            counts["skipped"] += skipped
+
+        removed = _remove_stale_chunks(source_id, run_id, persist=False)
+        checkpoint(page_number)
+        counts["removed"] = removed
+        return counts
+
+def add_pdf_to_vectorstore(pdf_path: str, metadata: Dict) -> str:
+    extractor = TopicExtractor()
+    ingest_pdf(pdf_path, metadata, run_id=uuid.uuid4().hex, on_chunk=extractor.add_chunk)
+
+    result = extractor.finish()
     return result if result else "No important topics found."
 
+def _parse_and_split(pdf_path: str) -> Dict:
+    """
+    Loads and splits one PDF. Runs in a worker process of the parse pool, so it
+    only returns plain data: the chunks as (text, page metadata) pairs and the
+    time spent parsing and splitting.
+    """
+    started = time.perf_counter()
+    pages = PyPDFLoader(pdf_path).load()
+    parsed = time.perf_counter()
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(pages)
+    return {
+        "pages": len(pages),
+        "chunks": [(chunk.page_content, chunk.metadata) for chunk in chunks],
+        "parseSeconds": parsed - started,
+        "splitSeconds": time.perf_counter() - parsed,
+    }
+
+def ingest_pdfs(pdfs: List[Tuple[str, Dict]]) -> Dict:
+    """
+    Ingests several PDFs at once, e.g. every chapter of a course.
+
+    The PDFs are parsed and split in parallel in the parse pool (INGEST_PROCESS_WORKERS
+    processes), so CPU-bound pypdf work doesn't hold the API worker's GIL. Chunks of all
+    files are then checked against the store with one lookup, only new chunks are
+    embedded, in cross-document batches of INGEST_EMBED_BATCH_SIZE, and written with
+    one upsert and a single persist. Lookups, metadata updates and upserts are
+    split only above INGEST_WRITE_BATCH_SIZE ids, below Chroma's batch limit.
+    Chunk ids, run stamping and stale-chunk removal work as in `ingest_pdf`.
+
+    A file that fails to parse is reported in its result and skipped; the others are
+    still ingested.
+
+    Args:
+        pdfs (List[Tuple[str, Dict]]): (pdf_path, metadata) per file.
+
+    Returns:
+        Dict: {"files": per-file results and timings, "timings": shared stage timings}.
+    """
+    started = time.perf_counter()
+    run_id = uuid.uuid4().hex
+    files = []
+    for pdf_path, metadata in pdfs:
+        metadata = _normalize_metadata(metadata)
+        source_id = metadata.get("pdf_id") or pdf_path
+        metadata.update({"source_id": source_id, "ingest_run": run_id})
+        files.append({"pdf_path": pdf_path, "metadata": metadata, "result": {"pdfPath": pdf_path, "sourceId": source_id}})
+
+    with span("vectorizer", "bulk_parse"):
+        futures = [get_service("parse_pool").submit(_parse_and_split, file["pdf_path"]) for file in files]
+        for file, future in zip(files, futures):
+            try:
+                parsed = future.result()
+            except Exception as e:
+                file["result"].update({"status": "failed", "error": str(e)})
+                continue
+            file["chunks"] = parsed.pop("chunks")
+            file["result"].update({"status": "ok", **parsed})
+    parse_seconds = time.perf_counter() - started
+
+    ingested = [file for file in files if file["result"]["status"] == "ok"]
+    unique: Dict[str, Tuple[Document, Dict]] = {}
+    for file in ingested:
+        file["extractor"] = TopicExtractor()
+        file["result"].update({"chunks": 0, "embedded": 0})
+        for text, page_metadata in file.pop("chunks"):
+            chunk_id = make_chunk_id(file["metadata"]["source_id"], text)
+            if chunk_id not in unique:
+                unique[chunk_id] = (Document(page_content=text, metadata={**page_metadata, **file["metadata"]}), file)
+                file["result"]["chunks"] += 1
+            file["extractor"].add_chunk(text)
+
+    timings = {"parseSeconds": parse_seconds}
+    sources = sorted({file["metadata"]["source_id"] for file in ingested})
+    locks = [_source_locks[source_id] for source_id in sources]
+    for lock in locks:
+        lock.acquire()
+    try:
+        ids = list(unique)
+        existing = set()
+        with span("vectorizer", "chroma_lookup"):
+            for start in range(0, len(ids), INGEST_WRITE_BATCH_SIZE):
+                existing.update(_get_collection().get(ids=ids[start:start + INGEST_WRITE_BATCH_SIZE], include=[])["ids"])
+        new_ids = [chunk_id for chunk_id in unique if chunk_id not in existing]
+
+        stage = time.perf_counter()
+        embeddings = []
+        for start in range(0, len(new_ids), INGEST_EMBED_BATCH_SIZE):
+            embeddings.extend(embed_texts([unique[chunk_id][0].page_content for chunk_id in new_ids[start:start + INGEST_EMBED_BATCH_SIZE]]))
+        timings["embedSeconds"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        with span("vectorizer", "chroma_write"):
+            existing = list(existing)
+            for start in range(0, len(existing), INGEST_WRITE_BATCH_SIZE):
+                batch = existing[start:start + INGEST_WRITE_BATCH_SIZE]
+                _get_collection().update(ids=batch, metadatas=[unique[chunk_id][0].metadata for chunk_id in batch])
+            for start in range(0, len(new_ids), INGEST_WRITE_BATCH_SIZE):
+                batch = new_ids[start:start + INGEST_WRITE_BATCH_SIZE]
+                _get_collection().upsert(
+                    ids=batch,
+                    embeddings=embeddings[start:start + INGEST_WRITE_BATCH_SIZE],
+                    documents=[unique[chunk_id][0].page_content for chunk_id in batch],
+                    metadatas=[unique[chunk_id][0].metadata for chunk_id in batch],
+                )
+        for chunk_id in new_ids:
+            unique[chunk_id][1]["result"]["embedded"] += 1
+        removed = {source_id: _remove_stale_chunks(source_id, run_id, persist=False) for source_id in sources}
+        timings["writeSeconds"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        with span("vectorizer", "persist"):
+            _persist()
+        timings["persistSeconds"] = time.perf_counter() - stage
+        if new_ids:
+            _mark_collection_changed()
+    finally:
+        for lock in locks:
+            lock.release()
+
+    stage = time.perf_counter()
+    for file in ingested:
+        result = file["result"]
+        result["skipped"] = result["chunks"] - result["embedded"]
+        result["removed"] = removed.pop(result["sourceId"], 0)
+        topics_started = time.perf_counter()
+        result["importantTopics"] = file["extractor"].finish() or "No important topics found."
+        result["topicsSeconds"] = time.perf_counter() - topics_started
+    timings["topicsSeconds"] = time.perf_counter() - stage
+    timings["totalSeconds"] = time.perf_counter() - started
+    return {"files": [file["result"] for file in files], "timings": timings}
+
 def get_chunk_by_id(chunk_id: str) -> Document:
-    results = _vectorstore._collection.get(ids=[chunk_id])
+    results = _get_collection().get(ids=[chunk_id])
     if not results['documents']:
         return None
     return {
@@ -44,26 +447,139 @@ def get_chunk_by_id(chunk_id: str) -> Document:
     }
 
 def delete_chunks_by_ids(chunk_ids: List[str]) -> bool:
-    _vectorstore._collection.delete(ids=chunk_ids)
-    _vectorstore.persist()
+    _get_collection().delete(ids=chunk_ids)
+    _persist()
+    _mark_collection_changed()
     return True
 
-def search_similar_chunks(query: str, k: int = 5) -> List[Document]:
-    return _vectorstore.similarity_search(query, k=k)
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embeds `texts` with the shared embedding model in one forward pass.
+    """
+    with span("vectorizer", "embedding"):
+        return _get_embeddings().embed_documents(texts)
+
+def search_similar_chunks(query: str, k: int = 5, pdf_ids: Optional[List[str]] = None) -> List[Document]:
+    return search_similar_chunks_batch([query], k=k, pdf_ids=pdf_ids)[0]
 
-def get_all_chunks() -> List[Document]:
-    all_docs = _vectorstore._collection.get(include=["documents", "metadatas"])
-    if not all_docs or not all_docs["documents"]:
+def search_similar_chunks_batch(queries: List[str], k: int = 5, pdf_ids: Optional[List[str]] = None) -> List[List[Document]]:
+    """
+    Retrieves the top-k chunks for several queries at once.
+
+    All queries are embedded in a single model forward pass and sent to Chroma as
+    one vectorized query, instead of one embedding + one query per string.
+
+    Args:
+        queries (List[str]): The query strings.
+        k (int): Number of chunks to return per query.
+        pdf_ids (List[str], optional): Restrict the search to chunks of these syllabus PDFs.
+
+    Returns:
+        List[List[Document]]: One list of documents per query, in the same order.
+    """
+    if not queries:
         return []
-    
+
+    with span("vectorizer", "embedding"):
+        query_embeddings = _get_embeddings().embed_documents(queries)
+    with span("vectorizer", "chroma_search"):
+        results = _get_collection().query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=build_scope_filter(pdf_ids),
+            include=["documents", "metadatas"],
+        )
+
     return [
-        Document(page_content=doc, metadata=meta)
-        for doc, meta in zip(all_docs["documents"], all_docs["metadatas"])
+        [Document(page_content=doc, metadata=meta or {}) for doc, meta in zip(docs, metas)]
+        for docs, metas in zip(results["documents"], results["metadatas"])
     ]
+
+def search_similar_chunks_with_embeddings(
+    queries: List[str], k: int = 5, pdf_ids: Optional[List[str]] = None
+) -> Tuple[List[List[float]], List[List[Tuple[Document, List[float]]]]]:
+    """
+    Same batched search as `search_similar_chunks_batch`, but also returns the query
+    embeddings and each chunk's stored embedding, for callers that re-rank (e.g. MMR).
+
+    Returns:
+        Tuple: (query embeddings, per query a list of (document, embedding) pairs).
+    """
+    if not queries:
+        return [], []
+
+    with span("vectorizer", "embedding"):
+        query_embeddings = _get_embeddings().embed_documents(queries)
+    with span("vectorizer", "chroma_search"):
+        results = _get_collection().query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=build_scope_filter(pdf_ids),
+            include=["documents", "metadatas", "embeddings"],
+        )
+
+    return query_embeddings, [
+        [(Document(page_content=doc, metadata=meta or {}), emb) for doc, meta, emb in zip(docs, metas, embs)]
+        for docs, metas, embs in zip(results["documents"], results["metadatas"], results["embeddings"])
+    ]
+
+def build_metadata_filter(filters: Dict) -> Optional[Dict]:
+    """
+    Builds a Chroma `where` filter that matches every non-empty metadata field in `filters`.
+    """
+    conditions = [{key: value} for key, value in filters.items() if value]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+def get_chunks_page(limit: int = 100, offset: int = 0, filters: Optional[Dict] = None, include_text: bool = True) -> Dict:
+    """
+    Returns one page of stored chunks.
+
+    Args:
+        limit (int): Maximum number of chunks to return.
+        offset (int): Number of matching chunks to skip.
+        filters (Dict, optional): Metadata fields the chunks must match, e.g. {"pdf_id": "..."}.
+        include_text (bool): Whether to include the chunk text or only ids and metadata.
+
+    Returns:
+        Dict: {"chunks": [...], "nextOffset": int or None when there are no more pages}.
+    """
+    include = ["metadatas", "documents"] if include_text else ["metadatas"]
+    results = _get_collection().get(
+        where=build_metadata_filter(filters or {}),
+        limit=limit,
+        offset=offset,
+        include=include,
+    )
+
+    chunks = []
+    for i, chunk_id in enumerate(results["ids"]):
+        chunk = {"id": chunk_id, "metadata": results["metadatas"][i]}
+        if include_text:
+            chunk["page_content"] = results["documents"][i]
+        chunks.append(chunk)
+
+    next_offset = offset + len(chunks) if len(chunks) == limit else None
+    return {"chunks": chunks, "nextOffset": next_offset}
+
+def iter_chunks(page_size: int = 500, filters: Optional[Dict] = None, include_text: bool = True) -> Iterator[Dict]:
+    """
+    Walks every matching chunk page by page, holding at most one page in memory.
+    """
+    offset = 0
+    while offset is not None:
+        page = get_chunks_page(limit=page_size, offset=offset, filters=filters, include_text=include_text)
+        yield from page["chunks"]
+        offset = page["nextOffset"]
     
 def delete_all_chunks() -> bool:
     try:
-        _vectorstore._collection.delete(ids=None)  
+        _get_collection().delete(ids=None)  
+        _persist()
+        _mark_collection_changed()
         return True
     except Exception as e:
         print(f"Error deleting all chunks: {e}")
@@ -0,0 +1,229 @@
+"""
+Per-exam index of every generated question, used to keep papers of the same
+exam from repeating each other's questions.
+
+Each exam keeps its question embeddings as rows of one contiguous, normalized
+float32 matrix, so checking a new paper against all earlier ones is a single
+(paper x stored) matrix product plus a max per row: a couple of milliseconds at
+10k+ stored questions. An optional 64-bit SimHash prefilter catches questions
+that are near-copies word for word before they are embedded at all.
+
+Checking a paper only reserves its unique questions: they already count as
+taken for other papers, but are stored only when the paper is committed (handed
+out) and dropped when it is released (rejected or discarded), so questions of
+papers nobody received do not block later ones.
+
+Indexes are appended to QUESTION_INDEX_DIR (one directory per exam) so they
+survive restarts.
+"""
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from schemas.exam_request_schema import ExamPaperRequest
+from utils.context_cache import make_cache_key
+
+load_dotenv()
+
+QUESTION_INDEX_DIR = os.getenv("QUESTION_INDEX_DIR", "exgenai_question_index")
+QUESTION_DUPLICATE_SIMILARITY = float(os.getenv("QUESTION_DUPLICATE_SIMILARITY", "0.9"))
+QUESTION_SIMHASH_PREFILTER = os.getenv("QUESTION_SIMHASH_PREFILTER", "true").lower() == "true"
+QUESTION_SIMHASH_DISTANCE = int(os.getenv("QUESTION_SIMHASH_DISTANCE", "3"))
+
+
+def get_exam_key(req: ExamPaperRequest) -> str:
+    """
+    Identifies an exam by the content of its paper request, which is identical for every student.
+    """
+    return make_cache_key("exam-paper", jsonable_encoder(req))
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over word bigrams; near-identical texts differ in only a few bits.
+    """
+    words = text.lower().split()
+    shingles = [" ".join(words[i:i + 2]) for i in range(max(len(words) - 1, 1))]
+    weights = np.zeros(64, dtype=np.int32)
+    for shingle in shingles:
+        bits = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        weights += np.where((bits >> np.arange(64, dtype=np.uint64)) & 1, 1, -1).astype(np.int32)
+    return int(np.packbits((weights > 0)[::-1]).view(">u8")[0])
+
+
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def _min_hamming(stored: np.ndarray, hashes: List[int]) -> np.ndarray:
+    """
+    For each of `hashes`, the smallest bit distance to any of the `stored` hashes.
+    """
+    xor = np.bitwise_xor(stored[None, :], np.array(hashes, dtype=np.uint64)[:, None])
+    if hasattr(np, "bitwise_count"):
+        bits = np.bitwise_count(xor)
+    else:
+        bits = _POPCOUNT[xor.view(np.uint8)].reshape(len(hashes), len(stored), 8).sum(axis=2)
+    return bits.min(axis=1)
+
+
+class QuestionIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._hashes = np.zeros(256, dtype=np.uint64)
+        self._size = 0
+        self._reserved: Dict[str, List[Tuple[str, int, np.ndarray]]] = {}
+        self.duplicates = 0
+        self._load()
+
+    def _load(self):
+        records_path = os.path.join(self.directory, "questions.jsonl")
+        vectors_path = os.path.join(self.directory, "vectors.f32")
+        records = []
+        if os.path.exists(records_path):
+            with open(records_path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        if not records:
+            if os.path.exists(vectors_path):
+                os.remove(vectors_path)
+            return
+        dim = records[0]["dim"]
+        vectors = np.fromfile(vectors_path, dtype=np.float32)
+        count = min(len(records), len(vectors) // dim)
+        if count < len(records) or count * dim < len(vectors):
+            # An append was interrupted; drop the unmatched tail of either file.
+            records, vectors = records[:count], vectors[:count * dim]
+            vectors.tofile(vectors_path)
+            with open(records_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+        if count:
+            self._append(vectors.reshape(count, dim), [record["simhash"] for record in records])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _append(self, vectors: np.ndarray, hashes: List[int]):
+        needed = self._size + len(vectors)
+        if needed > self._matrix.shape[0] or self._matrix.shape[1] != vectors.shape[1]:
+            capacity = max(needed, 2 * self._matrix.shape[0], 256)
+            matrix = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+            if self._size:
+                matrix[:self._size] = self._matrix[:self._size]
+            self._matrix = matrix
+        if needed > len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros(max(needed, len(self._hashes)), dtype=np.uint64)])
+        self._matrix[self._size:needed] = vectors
+        self._hashes[self._size:needed] = np.array(hashes, dtype=np.uint64)
+        self._size = needed
+
+    def prefilter(self, texts: List[str]) -> Set[int]:
+        """
+        Positions of `texts` whose SimHash is within QUESTION_SIMHASH_DISTANCE bits of a stored question.
+        """
+        if not QUESTION_SIMHASH_PREFILTER or not self._size:
+            return set()
+        distances = _min_hamming(self._hashes[:self._size], [simhash(text) for text in texts])
+        return set(np.flatnonzero(distances <= QUESTION_SIMHASH_DISTANCE).tolist())
+
+    @staticmethod
+    def _duplicates(batch: np.ndarray, hashes: List[int], matrix: np.ndarray, stored: np.ndarray) -> np.ndarray:
+        if not len(matrix):
+            return np.zeros(len(batch), dtype=bool)
+        # (stored x paper) keeps the large matrix as the row-major operand, which is faster.
+        duplicate = (matrix @ batch.T).max(axis=0) >= QUESTION_DUPLICATE_SIMILARITY
+        if QUESTION_SIMHASH_PREFILTER:
+            duplicate |= _min_hamming(stored, hashes) <= QUESTION_SIMHASH_DISTANCE
+        return duplicate
+
+    def check(self, texts: List[str], vectors: Dict[int, np.ndarray], reservation: str) -> List[int]:
+        """
+        Checks one paper's questions against every stored or reserved question
+        and against each other, reserves the unique ones under `reservation`
+        and returns the positions that collide.
+
+        Args:
+            texts (List[str]): Question texts of the paper.
+            vectors (Dict[int, np.ndarray]): Embeddings by position; positions
+                without one (e.g. caught by the prefilter) count as collisions.
+            reservation (str): Id of the paper; may be checked in several rounds.
+        """
+        with self._lock:
+            positions = sorted(vectors)
+            colliding = set(range(len(texts))) - set(positions)
+            if positions:
+                batch = np.asarray([vectors[i] for i in positions], dtype=np.float32)
+                batch /= np.maximum(np.linalg.norm(batch, axis=1, keepdims=True), 1e-12)
+                hashes = [simhash(texts[i]) for i in positions]
+
+                duplicate = self._duplicates(batch, hashes, self._matrix[:self._size], self._hashes[:self._size])
+                reserved = [entry for entries in self._reserved.values() for entry in entries]
+                if reserved:
+                    duplicate |= self._duplicates(
+                        batch, hashes,
+                        np.stack([vector for _, _, vector in reserved]),
+                        np.array([value for _, value, _ in reserved], dtype=np.uint64),
+                    )
+                within = np.triu(batch @ batch.T >= QUESTION_DUPLICATE_SIMILARITY, k=1)
+                duplicate |= within.any(axis=0)
+
+                colliding |= {positions[row] for row in np.flatnonzero(duplicate)}
+                self._reserved.setdefault(reservation, []).extend(
+                    (texts[positions[row]], hashes[row], batch[row]) for row in np.flatnonzero(~duplicate)
+                )
+            self.duplicates += len(colliding)
+            return sorted(colliding)
+
+    def commit(self, reservation: str, texts: Optional[List[str]] = None):
+        """
+        Stores the questions reserved under `reservation` for good; with `texts`,
+        only those still in the final paper.
+        """
+        with self._lock:
+            entries = self._reserved.pop(reservation, [])
+            if texts is not None:
+                final = set(texts)
+                entries = [entry for entry in entries if entry[0] in final]
+            if entries:
+                vectors = np.stack([vector for _, _, vector in entries])
+                self._append(vectors, [value for _, value, _ in entries])
+                self._persist(vectors, [(text, value) for text, value, _ in entries])
+
+    def release(self, reservation: str):
+        """
+        Drops the questions reserved under `reservation` without storing them.
+        """
+        with self._lock:
+            self._reserved.pop(reservation, None)
+
+    def _persist(self, vectors: np.ndarray, records: List):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "vectors.f32"), "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(os.path.join(self.directory, "questions.jsonl"), "a", encoding="utf-8") as f:
+            for text, value in records:
+                f.write(json.dumps({"text": text, "simhash": value, "dim": vectors.shape[1]}) + "\n")
+
+
+_indexes: Dict[str, QuestionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_question_index(exam_key: str) -> QuestionIndex:
+    with _indexes_lock:
+        if exam_key not in _indexes:
+            _indexes[exam_key] = QuestionIndex(os.path.join(QUESTION_INDEX_DIR, exam_key))
+        return _indexes[exam_key]
+
+
+def question_index_stats() -> Dict:
+    return {
+        "exams": len(_indexes),
+        "questions": sum(len(index) for index in _indexes.values()),
+        "reserved": sum(len(entries) for index in _indexes.values() for entries in list(index._reserved.values())),
+        "duplicatesFound": sum(index.duplicates for index in _indexes.values()),
+    }
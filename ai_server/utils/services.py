@@ -0,0 +1,65 @@
+import time
+import threading
+from typing import Callable, Dict
+
+_factories: Dict[str, Callable] = {}
+_instances: Dict[str, object] = {}
+_locks: Dict[str, threading.Lock] = {}
+_warmups: Dict[str, Callable] = {}
+_warmup_state = {"status": "pending", "startedAt": None, "finishedAt": None, "steps": {}, "error": None}
+
+
+def register_service(name: str, factory: Callable):
+    """
+    Registers a factory for an expensive object (model, client, store). It is
+    only called the first time the service is requested.
+    """
+    _factories[name] = factory
+    _locks[name] = threading.Lock()
+
+
+def get_service(name: str):
+    if name in _instances:
+        return _instances[name]
+    with _locks[name]:
+        if name not in _instances:
+            _instances[name] = _factories[name]()
+    return _instances[name]
+
+
+def is_loaded(name: str) -> bool:
+    return name in _instances
+
+
+def register_warmup(name: str, warmup: Callable):
+    """
+    Registers a step that `run_warmups` runs once at startup, e.g. a dummy embedding.
+    """
+    _warmups[name] = warmup
+
+
+def run_warmups():
+    """
+    Runs every warm-up step in registration order and records timings. Meant to
+    run on a worker thread at startup; readiness flips to ready once all steps pass.
+    """
+    _warmup_state["status"] = "warming"
+    _warmup_state["startedAt"] = time.time()
+    try:
+        for name, warmup in _warmups.items():
+            started = time.perf_counter()
+            warmup()
+            _warmup_state["steps"][name] = round(time.perf_counter() - started, 3)
+        _warmup_state["status"] = "ready"
+    except Exception as e:
+        _warmup_state["status"] = "failed"
+        _warmup_state["error"] = str(e)
+    _warmup_state["finishedAt"] = time.time()
+
+
+def is_ready() -> bool:
+    return _warmup_state["status"] == "ready"
+
+
+def readiness() -> Dict:
+    return {**_warmup_state, "loadedServices": sorted(_instances)}
@@ -0,0 +1,542 @@
+"""
+Lightweight in-process vector index, an alternative to Chroma for small
+collections (VECTOR_BACKEND=numpy).
+
+Vectors are L2-normalized float32 rows kept in `vectors.npy`, which is
+memory-mapped on open, so a cold start only maps the file and parses the
+chunk records. Search is a single matrix product of the query batch against
+the (filtered) rows followed by a partial sort, which is exact and takes well
+under a millisecond for the few thousand chunks of a syllabus.
+
+`NumpyVectorIndex` implements the subset of Chroma's collection API that
+utils/pdf_vectorizer.py uses (get, query, upsert, update, delete, count),
+including `where` filters with equality, $in, $ne and $and, so the vectorizer
+works the same on either backend. Every `persist()` writes the collection to
+a new version directory and then points the `CURRENT` file at it with one
+atomic rename, so a crash leaves the previous version intact; the index is
+meant for syllabus-sized collections, not millions of vectors.
+
+Vectors can be stored compactly (`precision`): as float16, or as int8 with
+one float32 scale per vector, which cut the vectors file, the memory it maps
+and the bytes a search reads to a half or a quarter. Compact rows are searched
+directly, converted block by block, so the whole collection is never expanded
+to float32 at once. With `rescore=N` a float32 copy is kept next to the compact
+file and the top N*k candidates are rescored against it, which restores exact
+ranking while a search only pages in the rows it rescores.
+
+Copy an existing Chroma store into the index, or back, or convert the index
+to another precision:
+
+    python -m utils.vector_index import --chroma-dir exgenai_vector_store --index-dir exgenai_vector_index --precision int8
+    python -m utils.vector_index export --chroma-dir exgenai_vector_store --index-dir exgenai_vector_index
+    python -m utils.vector_index convert --index-dir exgenai_vector_index --precision int8 --rescore 4
+
+benchmarks/quantization.py reports recall@k, memory and latency of each
+precision against float32.
+"""
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+FULL_VECTORS_FILE = "vectors.f32.npy"
+RECORDS_FILE = "records.json"
+CURRENT_FILE = "CURRENT"
+PRECISIONS = ("float32", "float16", "int8")
+# Compact rows are converted to float32 this many at a time while scoring.
+SCORE_BLOCK_ROWS = 8192
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Returns (rows, scales) in `precision`; scales are per-row and only used for int8.
+    """
+    if precision == "float16":
+        return vectors.astype(np.float16), None
+    if precision == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales = np.where(scales == 0, 1, scales).astype(np.float32)
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales
+    return np.asarray(vectors, dtype=np.float32), None
+
+
+def dequantize(rows: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows * scales[:, None] if scales is not None else rows
+
+
+def _scores(queries: np.ndarray, matrix: np.ndarray, scales: Optional[np.ndarray], size: int,
+            rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Similarity of each query to the first `size` rows (or to `rows`) of a possibly compact matrix.
+    """
+    count = size if rows is None else len(rows)
+    if matrix.dtype == np.float32 and scales is None:
+        return queries @ (matrix[:size] if rows is None else matrix[rows]).T
+    scores = np.empty((len(queries), count), dtype=np.float32)
+    for start in range(0, count, SCORE_BLOCK_ROWS):
+        block = slice(start, min(start + SCORE_BLOCK_ROWS, count)) if rows is None else rows[start:start + SCORE_BLOCK_ROWS]
+        part = queries @ matrix[block].astype(np.float32).T
+        if scales is not None:
+            part *= scales[block]
+        scores[:, start:start + part.shape[1]] = part
+    return scores
+
+
+class _FloatRows:
+    """
+    The float32 copy kept for rescoring. Bulk reads go through a memory map;
+    the few scattered rows a search rescores are read with pread, so they are
+    not mapped into the process along with their neighbours.
+    """
+
+    def __init__(self, path: str):
+        self.array = np.load(path, mmap_mode="r")
+        self._fd = os.open(path, os.O_RDONLY) if hasattr(os, "pread") else None
+        self._row_bytes = self.array.shape[1] * self.array.itemsize
+
+    def __getitem__(self, rows) -> np.ndarray:
+        return self.array[rows]
+
+    def read_rows(self, rows: np.ndarray) -> np.ndarray:
+        if self._fd is None:
+            return np.asarray(self.array[rows], dtype=np.float32)
+        out = np.empty((len(rows), self.array.shape[1]), dtype=np.float32)
+        for i, row in enumerate(rows.tolist()):
+            data = os.pread(self._fd, self._row_bytes, self.array.offset + row * self._row_bytes)
+            out[i] = np.frombuffer(data, dtype=np.float32)
+        return out
+
+    def __del__(self):
+        if self._fd is not None:
+            os.close(self._fd)
+
+
+def _matches(metadata: Dict, where: Dict) -> bool:
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$eq" and value != operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorIndex:
+    def __init__(self, directory: str, precision: Optional[str] = None, rescore: int = 0):
+        """
+        Args:
+            directory (str): Where the collection is stored.
+            precision (str, optional): Storage precision for the next `persist()`
+                ("float32", "float16" or "int8"); defaults to the stored one.
+            rescore (int): With compact precision, rescore the top `rescore * k`
+                candidates in float32 (0 disables it, and no float32 copy is kept).
+        """
+        if precision is not None and precision not in PRECISIONS:
+            raise ValueError(f"Unknown vector precision {precision!r}, expected one of {PRECISIONS}")
+        self.directory = directory
+        self.rescore = rescore
+        self._lock = threading.RLock()
+        self._persist_lock = threading.Lock()
+        self._version = 0
+        self._mask_cache = {}
+        self._dirty = False
+        self._load()
+        self.precision = precision or self._stored_precision
+
+    def _data_dir(self) -> str:
+        """
+        Directory of the current version; stores written before versioning keep
+        their files in the collection directory itself.
+        """
+        pointer = os.path.join(self.directory, CURRENT_FILE)
+        if os.path.exists(pointer):
+            with open(pointer, encoding="utf-8") as f:
+                return os.path.join(self.directory, f.read().strip())
+        return self.directory
+
+    def _load(self):
+        data_dir = self._data_dir()
+        vectors_path = os.path.join(data_dir, VECTORS_FILE)
+        records_path = os.path.join(data_dir, RECORDS_FILE)
+        scales_path = os.path.join(data_dir, SCALES_FILE)
+        full_path = os.path.join(data_dir, FULL_VECTORS_FILE)
+        self._scales = self._full = None
+        if os.path.exists(records_path):
+            with open(records_path, encoding="utf-8") as f:
+                records = json.load(f)
+            self._matrix = np.load(vectors_path, mmap_mode="r")
+            if os.path.exists(scales_path):
+                self._scales = np.load(scales_path, mmap_mode="r")
+            if os.path.exists(full_path):
+                self._full = _FloatRows(full_path)
+            arrays = (self._matrix, self._scales, self._full.array if self._full is not None else None)
+            if any(array is not None and len(array) != len(records["ids"]) for array in arrays):
+                raise ValueError(f"Vector index {data_dir} is inconsistent: {len(records['ids'])} records, {len(self._matrix)} vectors")
+        else:
+            records = {"ids": [], "documents": [], "metadatas": []}
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._stored_precision = records.get("precision", "float32")
+        self._ids: List[str] = records["ids"]
+        self._documents: List[str] = records["documents"]
+        self._metadatas: List[Dict] = records["metadatas"]
+        self._size = len(self._ids)
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+
+    def _snapshot(self):
+        with self._lock:
+            vectors = (self._matrix, self._scales, self._full)
+            return vectors, self._size, self._ids, self._documents, self._metadatas, self._rows, self._version
+
+    def _changed(self):
+        self._version += 1
+        self._mask_cache.clear()
+        self._dirty = True
+
+    def _row_mask(self, where: Optional[Dict], metadatas: List[Dict], size: int, version: int) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        key = (json.dumps(where, sort_keys=True), version)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.fromiter((_matches(metadatas[row], where) for row in range(size)), dtype=bool, count=size)
+            with self._lock:
+                if self._version == version:
+                    self._mask_cache[key] = mask
+        return mask
+
+    def count(self) -> int:
+        return self._size
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None, include: Optional[List[str]] = None) -> Dict:
+        include = ["metadatas", "documents"] if include is None else include
+        vectors, size, all_ids, documents, metadatas, id_rows, version = self._snapshot()
+        if ids is not None:
+            rows = [id_rows[chunk_id] for chunk_id in ids if id_rows.get(chunk_id, size) < size]
+            if where:
+                rows = [row for row in rows if _matches(metadatas[row], where)]
+        else:
+            mask = self._row_mask(where, metadatas, size, version)
+            rows = np.flatnonzero(mask).tolist() if mask is not None else list(range(size))
+        start = offset or 0
+        rows = rows[start:start + limit] if limit is not None else rows[start:]
+        return self._records(rows, include, vectors, all_ids, documents, metadatas)
+
+    @staticmethod
+    def _float_rows(vectors, rows) -> np.ndarray:
+        """
+        Rows as float32: from the float32 copy when there is one, otherwise dequantized.
+        """
+        matrix, scales, full = vectors
+        if full is not None:
+            return np.asarray(full[rows], dtype=np.float32)
+        return dequantize(matrix[rows], scales[rows] if scales is not None else None)
+
+    def _records(self, rows, include, vectors, ids, documents, metadatas) -> Dict:
+        result = {"ids": [ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [documents[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [metadatas[row] for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self._float_rows(vectors, np.asarray(rows, dtype=np.int64)).tolist()
+        return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[List[str]] = None) -> Dict:
+        """
+        Exact top-k by cosine similarity for a batch of queries (approximate on
+        compact precision unless rescoring). Distances are reported as
+        1 - similarity so smaller is closer, as in Chroma.
+        """
+        include = ["metadatas", "documents", "distances"] if include is None else include
+        vectors, size, ids, documents, metadatas, _, version = self._snapshot()
+        matrix, scales, full = vectors
+        queries = _normalize(query_embeddings)
+        keys = ["ids", *[field for field in ("documents", "metadatas", "embeddings", "distances") if field in include]]
+        result = {key: [] for key in keys}
+
+        mask = self._row_mask(where, metadatas, size, version)
+        candidates = np.flatnonzero(mask) if mask is not None else None
+        count = size if candidates is None else len(candidates)
+        if count == 0:
+            for key in keys:
+                result[key] = [[] for _ in queries]
+            return result
+
+        scores = _scores(queries, matrix, scales, size, candidates)
+        k = min(n_results, count)
+        rescoring = self.rescore > 0 and full is not None and (matrix.dtype != np.float32 or scales is not None)
+        shortlist = min(k * self.rescore, count) if rescoring else k
+        top = np.argpartition(-scores, shortlist - 1, axis=1)[:, :shortlist]
+        if rescoring:
+            rows = top if candidates is None else candidates[top]
+            scores = np.einsum("qd,qkd->qk", queries, full.read_rows(rows.ravel()).reshape(*rows.shape, -1))
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top = np.take_along_axis(top, best, axis=1)
+            top_scores = np.take_along_axis(scores, best, axis=1)
+        else:
+            top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        for positions, row_scores in zip(top, top_scores):
+            rows = positions if candidates is None else candidates[positions]
+            records = self._records(rows.tolist(), include, vectors, ids, documents, metadatas)
+            for key in keys:
+                if key == "distances":
+                    result[key].append((1 - row_scores).tolist())
+                else:
+                    result[key].append(records[key])
+        return result
+
+    def _in_memory(self) -> bool:
+        return not isinstance(self._matrix, np.memmap) and self._matrix.dtype == np.float32 and self._scales is None
+
+    def _all_rows(self) -> np.ndarray:
+        if self._in_memory():
+            return self._matrix[:self._size]
+        return self._float_rows((self._matrix, self._scales, self._full), slice(0, self._size))
+
+    def _writable(self, dim: int, extra: int):
+        """
+        Switches from the read-only (possibly compact) memory map to an in-memory
+        float32 matrix with room for `extra` rows.
+        """
+        capacity = self._matrix.shape[0] if self._in_memory() else 0
+        if self._size + extra <= capacity and self._matrix.shape[1] == dim:
+            return
+        new_capacity = max(self._size + extra, 2 * capacity, 256)
+        matrix = np.zeros((new_capacity, dim), dtype=np.float32)
+        if self._size:
+            matrix[:self._size] = self._all_rows()
+        self._matrix, self._scales, self._full = matrix, None, None
+
+    def upsert(self, ids: List[str], embeddings, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict]] = None):
+        vectors = _normalize(embeddings)
+        documents = documents or [""] * len(ids)
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            new = [chunk_id for chunk_id in ids if chunk_id not in self._rows]
+            self._writable(vectors.shape[1], len(new))
+            for chunk_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    row = self._size
+                    self._rows[chunk_id] = row
+                    self._ids.append(chunk_id)
+                    self._documents.append(document)
+                    self._metadatas.append(dict(metadata))
+                    self._size += 1
+                else:
+                    self._documents[row] = document
+                    self._metadatas[row] = dict(metadata)
+                self._matrix[row] = vector
+            self._changed()
+
+    add = upsert
+
+    def update(self, ids: List[str], metadatas: List[Dict]):
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(chunk_id)
+                if row is not None:
+                    self._metadatas[row] = dict(metadata)
+            self._changed()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        with self._lock:
+            if ids is None and where is None:
+                drop = set(range(self._size))
+            else:
+                drop = {self._rows[chunk_id] for chunk_id in ids or [] if chunk_id in self._rows}
+                if where:
+                    drop |= {row for row in range(self._size) if _matches(self._metadatas[row], where)}
+            if not drop:
+                return
+            keep = [row for row in range(self._size) if row not in drop]
+            self._matrix = np.array(self._all_rows()[keep], dtype=np.float32) if keep else np.zeros((0, 0), dtype=np.float32)
+            self._scales = self._full = None
+            self._ids = [self._ids[row] for row in keep]
+            self._documents = [self._documents[row] for row in keep]
+            self._metadatas = [self._metadatas[row] for row in keep]
+            self._size = len(keep)
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._changed()
+
+    def convert(self, precision: str):
+        """
+        Switches the storage precision; the vectors are rewritten on the next
+        `persist()`. The float32 copy for rescoring is made from the best vectors
+        at hand, so convert from float32 to keep it exact.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown vector precision {precision!r}, expected one of {PRECISIONS}")
+        with self._lock:
+            self.precision = precision
+            self._changed()
+
+    def persist(self):
+        """
+        Writes the collection to disk and re-opens the vectors memory-mapped.
+
+        The files are written from a copy taken under the lock, so searches and
+        writes are not blocked meanwhile; if the collection changes during the
+        write it stays in memory, and dirty, until the next `persist()`.
+        """
+        with self._persist_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                version, precision = self._version, self.precision
+                vectors = np.array(self._all_rows(), dtype=np.float32)
+                records = {
+                    "ids": list(self._ids), "documents": list(self._documents), "metadatas": list(self._metadatas),
+                    "precision": precision,
+                }
+            rows, scales = quantize(vectors, precision)
+            files = {VECTORS_FILE: rows, SCALES_FILE: scales}
+            if precision != "float32" and self.rescore > 0:
+                files[FULL_VECTORS_FILE] = vectors
+            current = self._write_version(files, records)
+            with self._lock:
+                if self._version == version:
+                    self._load()
+                    self._dirty = False
+            self._remove_old_versions(current)
+
+    def _write_version(self, files: Dict[str, Optional[np.ndarray]], records: Dict) -> str:
+        """
+        Writes a new version directory and switches CURRENT to it. Returns its name.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        numbers = [int(name[1:]) for name in os.listdir(self.directory) if name[:1] == "v" and name[1:].isdigit()]
+        name = f"v{max(numbers, default=0) + 1:06d}"
+        tmp_dir = os.path.join(self.directory, name + ".tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for file_name, array in files.items():
+            if array is not None:
+                with open(os.path.join(tmp_dir, file_name), "wb") as f:
+                    np.save(f, array)
+        with open(os.path.join(tmp_dir, RECORDS_FILE), "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        os.rename(tmp_dir, os.path.join(self.directory, name))
+        pointer = os.path.join(self.directory, CURRENT_FILE)
+        with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(pointer + ".tmp", pointer)
+        return name
+
+    def _remove_old_versions(self, current: str):
+        """
+        Deletes superseded version directories and the files of the unversioned
+        layout. Open memory maps of them stay valid until they are closed.
+        """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name[:1] == "v" and name != current and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name in (VECTORS_FILE, SCALES_FILE, FULL_VECTORS_FILE, RECORDS_FILE):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def storage_bytes(self) -> int:
+        """
+        Size of the current version's files on disk.
+        """
+        data_dir = self._data_dir()
+        if not os.path.isdir(data_dir):
+            return 0
+        return sum(
+            os.path.getsize(os.path.join(data_dir, name))
+            for name in os.listdir(data_dir) if os.path.isfile(os.path.join(data_dir, name))
+        )
+
+
+def import_from_chroma(collection, index: NumpyVectorIndex, page_size: int = 1000) -> int:
+    """
+    Copies every chunk (text, metadata and embedding) of a Chroma collection into the index.
+    """
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas", "embeddings"])
+        if not page["ids"]:
+            break
+        index.upsert(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+        offset += len(page["ids"])
+    index.persist()
+    return offset
+
+
+def export_to_chroma(index: NumpyVectorIndex, collection, page_size: int = 1000) -> int:
+    """
+    Copies every chunk of the index into a Chroma collection (upserting by id).
+    """
+    total = index.count()
+    for offset in range(0, total, page_size):
+        page = index.get(limit=page_size, offset=offset, include=["documents", "metadatas", "embeddings"])
+        collection.upsert(
+            ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"], metadatas=page["metadatas"]
+        )
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Copy chunks between Chroma and the NumPy vector index, or convert the index")
+    parser.add_argument("direction", choices=["import", "export", "convert"])
+    parser.add_argument("--chroma-dir", default="exgenai_vector_store")
+    parser.add_argument("--index-dir", default="exgenai_vector_index")
+    parser.add_argument("--collection", default="langchain")
+    parser.add_argument("--precision", choices=PRECISIONS, help="Storage precision of the index (import and convert)")
+    parser.add_argument("--rescore", type=int, default=0, help="Keep a float32 copy for rescoring (set VECTOR_RESCORE to match)")
+    args = parser.parse_args()
+
+    index = NumpyVectorIndex(os.path.join(args.index_dir, args.collection), precision=args.precision, rescore=args.rescore)
+    before = index.storage_bytes()
+    if args.direction == "convert":
+        index.convert(args.precision or index.precision)
+        index.persist()
+        print(f"Converted {index.count()} chunks in {index.directory} to {index.precision}: "
+              f"{before / 2**20:.1f} MB -> {index.storage_bytes() / 2**20:.1f} MB")
+    else:
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=args.chroma_dir).get_or_create_collection(args.collection)
+        if args.direction == "import":
+            print(f"Imported {import_from_chroma(collection, index)} chunks into {index.directory} ({index.precision})")
+        else:
+            print(f"Exported {export_to_chroma(index, collection)} chunks into {args.chroma_dir}")
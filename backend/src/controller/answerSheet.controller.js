@@ -24,7 +24,7 @@ export const submitAnswerSheet = asyncHandler(async (req, res) => {
         student: studentId,
     })
         .populate('questionPaperSchema', "evaluationInstruction")
-        .populate('exam', 'totalMarks');
+        .populate('exam', 'totalMarks syllabusData');
 
     if (!examPaper) return res.status(404).json(new ApiResponse(404, null, "Exam paper not found"));
 
@@ -48,12 +48,14 @@ export const submitAnswerSheet = asyncHandler(async (req, res) => {
         subjective_answers: subjectiveAnswers,
         code_answers: codeAnswers,
         evaluation_instructions: instructions,
+        syllabus_ids: (examPaper.exam.syllabusData || []).map(({ publicId }) => publicId),
     }
 
     const response = await fetch(`${AI_SERVER_URL}/evaluate-exam`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            'Idempotency-Key': `evaluate-exam-${examPaper._id}`,
         },
         body: JSON.stringify(payload),
     }).catch(err => {
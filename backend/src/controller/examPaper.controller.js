@@ -107,6 +107,7 @@ export const startExam = asyncHandler(async (req, res) => {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            'Idempotency-Key': `generate-paper-${examId}-${studentId}`,
         },
         body: JSON.stringify(payload),
     });